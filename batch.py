@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import re
+import time
+
+from dedup import strip_diacritics
+from enrichment import Enricher
+from exporters import PARTIAL_SUFFIX, JsonlSink
+from pipeline import run_pipeline_async
+
+# Jobs (query, location pairs) running at the same time in batch mode
+BATCH_WORKERS = 4
+BATCH_OUTPUT_DIR = 'batch_results'
+
+def slugify(text):
+    """Returns a filesystem-friendly version of a query or location ("Łódź" -> "lodz")."""
+    return re.sub(r'[^a-z0-9]+', '_', strip_diacritics(text or '')).strip('_') or 'all'
+
+def job_output(job, fmt='xlsx'):
+    """Returns the output file of a job: its output key, else one named after the job in BATCH_OUTPUT_DIR."""
+    if job.get('output'):
+        return job['output']
+    name = f"{slugify(job['job_id'])}_{slugify(job['query'])}_{slugify(job['location'])}"
+    return os.path.join(BATCH_OUTPUT_DIR, f"{name}.{job.get('format') or fmt}")
+
+def load_jobs(path, defaults=None):
+    """Reads a JSON Lines job file, one {"query": ..., "location": ...} object per line.
+
+    Optional keys: job_id (or request_id), emails, google, shard, output, format.
+    Keys missing from a job are taken from defaults. Blank lines and lines
+    starting with # are skipped, and so is a job writing to the same file as
+    an earlier one (both would write the same partial file at once).
+    """
+    defaults = defaults or {}
+    jobs = []
+    outputs = {} # Normalized output path -> job_id
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number} of {path}: {e}")
+                continue
+            if not job.get('query'):
+                print(f"Skipping line {line_number} of {path}: no query")
+                continue
+            job = {**defaults, **job}
+            job.setdefault('location', '')
+            job['job_id'] = str(job.get('job_id') or job.get('request_id') or f"job-{len(jobs) + 1}")
+            output = os.path.normcase(os.path.abspath(job_output(job)))
+            if output in outputs:
+                print(f"Skipping line {line_number} of {path}: job {job['job_id']} writes to the same file as "
+                      f"job {outputs[output]} ({job_output(job)})")
+                continue
+            outputs[output] = job['job_id']
+            jobs.append(job)
+    return jobs
+
+class JobReport:
+    """Timing and counts of one batch job."""
+
+    def __init__(self, job):
+        self.job = job
+        self.records = 0
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        self.started = None
+        self.elapsed = 0.0
+        self.output = None
+        self.error = None
+
+    @property
+    def rate(self):
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+async def _run_job(job, make_sources, save, store, enricher, workers, report, fmt):
+    async with workers:
+        report.started = time.perf_counter()
+        query, location = job['query'], job['location']
+        job_format = job.get('format') or fmt
+        output = job_output(job, fmt)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        partial_file = os.path.splitext(output)[0] + PARTIAL_SUFFIX
+        print(f"\n=== [{job['job_id']}] {query} in {location} ===")
+
+        run_id = store.start_run(query, location) if store else None
+        try:
+            with JsonlSink(partial_file, flush_each=True) as sink:
+                def write(result):
+                    if store:
+                        report.counts[store.save(result)] += 1
+                    sink.write(result)
+
+                report.records = await run_pipeline_async(
+                    make_sources(query, location, job.get('google'), job.get('shard')), write,
+                    enricher=enricher if job.get('emails') else None,
+                    should_enrich=store.should_enrich if store else None,
+                    crawl_failed=store.crawl_failed if store else None)
+
+            # Writing the output file is blocking, keep it off the event loop. save raises
+            # when the file cannot be written; the partial file is then kept
+            await asyncio.get_running_loop().run_in_executor(None, save, partial_file, output, job_format)
+            os.remove(partial_file)
+            report.output = output
+        except Exception as e:
+            report.error = str(e)
+            print(f"Error in job {job['job_id']}: {e}")
+            if os.path.exists(partial_file):
+                report.error += f" (records kept in {partial_file})"
+                print(f"Records collected so far are kept in {partial_file}")
+        finally:
+            if store:
+                store.finish_run(run_id, report.counts)
+            report.elapsed = time.perf_counter() - report.started
+
+async def run_batch_async(jobs, make_sources, save, fetch_emails=None, store=None, workers=BATCH_WORKERS, fmt='xlsx'):
+    """Runs many jobs in one process, sharing connections, caches and website crawls.
+
+    make_sources: callable(query, location, use_google, shard) -> sources dict for run_pipeline.
+    save: blocking callable(partial_jsonl_path, output_path, fmt) writing one job's results.
+    Up to `workers` jobs run at the same time. Every website is crawled at most
+    once per batch, even when several jobs find the same business.
+    Returns one JobReport per job, in job order.
+    """
+    semaphore = asyncio.Semaphore(max(1, workers))
+    enricher = Enricher(fetch_emails, share_crawls=True) if fetch_emails else None
+    reports = [JobReport(job) for job in jobs]
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_run_job(job, make_sources, save, store, enricher, semaphore, report, fmt)
+                               for job, report in zip(jobs, reports)))
+    finally:
+        if enricher:
+            enricher.close()
+    print_batch_report(reports, time.perf_counter() - start, enricher)
+    return reports
+
+def run_batch(jobs, make_sources, save, fetch_emails=None, **kwargs):
+    """Synchronous wrapper around run_batch_async for use from main()."""
+    return asyncio.run(run_batch_async(jobs, make_sources, save, fetch_emails, **kwargs))
+
+def print_batch_report(reports, elapsed, enricher=None):
+    """Prints records, time and throughput per job and for the whole batch."""
+    print(f"\n{'job':<20} {'records':>8} {'new':>6} {'seconds':>8} {'records/s':>10}  output")
+    for report in reports:
+        output = report.output or f"FAILED: {report.error}"
+        print(f"{report.job['job_id']:<20} {report.records:>8} {report.counts['new']:>6} "
+              f"{report.elapsed:8.1f} {report.rate:10.2f}  {output}")
+    total = sum(report.records for report in reports)
+    print(f"{'total':<20} {total:>8} {sum(r.counts['new'] for r in reports):>6} "
+          f"{elapsed:8.1f} {total / elapsed if elapsed else 0:10.2f}")
+    if enricher:
+        print(f"Websites crawled: {enricher.crawled} ({enricher.failed} failed), reused across jobs: {enricher.shared_hits}")
@@ -0,0 +1,86 @@
+import argparse
+import contextlib
+import io
+import re
+import time
+from urllib.parse import urlparse
+
+import crawler
+import domain_cache
+import http_cache
+import http_client
+import scraper
+from benchmarks.bench_emails import LEGACY_EMAIL_PATTERN, legacy_scan_page
+from benchmarks.fixtures import load_contact_sites
+from benchmarks.mock_server import MockServer
+
+# Requests per site and email recall of the contact-page crawler compared with
+# the previous "any two links containing kontakt/contact/about/o-nas" approach.
+# Run from the repository root: python -m benchmarks.bench_crawler
+
+def legacy_extract(url):
+    """The previous extract_emails_from_website: homepage plus an arbitrary two keyword links."""
+    session = http_client.get_session('websites')
+    response = session.get(url, timeout=15)
+    response.raise_for_status()
+    emails, hrefs = legacy_scan_page(response.text)
+    contact_links = []
+    base_domain = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(url))
+    for href in hrefs:
+        if any(keyword in href.lower() for keyword in ['kontakt', 'contact', 'about', 'o-nas']):
+            if href.startswith('/'):
+                contact_links.append(base_domain + href)
+            elif href.startswith('http'):
+                contact_links.append(href)
+            else:
+                contact_links.append(base_domain + '/' + href)
+    for contact_url in list(set(contact_links))[:2]:
+        try:
+            contact_response = session.get(contact_url, timeout=10)
+            contact_response.raise_for_status()
+            emails.extend(re.findall(LEGACY_EMAIL_PATTERN, contact_response.text))
+        except Exception:
+            pass
+    return list(set(emails))
+
+def run(label, extract, sites):
+    pages = {f"127.0.0.{i % 254 + 1}": site_pages for i, (site_pages, _) in enumerate(sites)}
+    expected = found = sites_with_emails = sites_found = 0
+    with MockServer(pages=pages) as server:
+        start = time.perf_counter()
+        for i, (_, emails) in enumerate(sites):
+            with contextlib.redirect_stdout(io.StringIO()):
+                try:
+                    result = set(extract(server.host_url(i)))
+                except Exception:
+                    result = set()
+            expected += len(emails)
+            found += len(result & set(emails))
+            if emails:
+                sites_with_emails += 1
+                sites_found += bool(result & set(emails))
+        elapsed = time.perf_counter() - start
+        requests_sent = server.requests
+    http_client.close_sessions()
+    print(f"{label:<10} {requests_sent / len(sites):12.2f} {found / max(expected, 1):12.1%} "
+          f"{sites_found / max(sites_with_emails, 1):11.1%} {elapsed:8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the contact-page crawler on fixture sites.")
+    parser.add_argument('--fixtures', help="Directory of saved sites (see benchmarks/fixtures.py)")
+    parser.add_argument('--sites', type=int, default=60, help="Synthetic sites when no fixtures are given")
+    args = parser.parse_args()
+
+    http_cache.configure_cache(enabled=False)
+    domain_cache.configure_domain_cache(enabled=False)
+    # Pacing is not what is measured here
+    http_client.THROTTLE_SETTINGS['websites'] = {'rate': 1000.0, 'min_rate': 1000.0, 'max_rate': 1000.0, 'burst': 100}
+    sites = load_contact_sites(args.fixtures, args.sites)
+    print(f"{len(sites)} sites, crawler budget {crawler.MAX_PAGES_PER_SITE} pages / "
+          f"{crawler.MAX_BYTES_PER_SITE // 1024} KiB per site\n")
+    print(f"{'crawler':<10} {'requests/site':>12} {'email recall':>12} {'site recall':>11} {'seconds':>8}")
+    run('legacy', legacy_extract, sites)
+    run('frontier', scraper.extract_emails_from_website, sites)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import random
+import time
+
+from dedup import Deduplicator, record_key
+
+# Scaling and accuracy of the deduplicator on synthetic multi-source records.
+# Run from the repository root: python -m benchmarks.bench_dedup
+
+FIRST_NAMES = ['Anna', 'Jan', 'Maria', 'Piotr', 'Katarzyna', 'Tomasz', 'Agnieszka', 'Paweł', 'Ewa', 'Michał']
+KINDS = ['Salon Fryzjerski', 'Studio Urody', 'Barber Shop', 'Gabinet Kosmetyczny', 'Fryzjer', 'Pracownia']
+SUFFIXES = ['', '', '', ' sp. z o.o.', ' s.c.', ' Spółka Jawna']
+CITIES = ['Kraków', 'Warszawa', 'Wrocław', 'Łódź', 'Poznań', 'Gdańsk']
+STREETS = ['Długa', 'Floriańska', 'Grodzka', 'Karmelicka', 'Starowiślna', 'Dietla', 'Zwierzyniecka',
+           'Mickiewicza', 'Słowackiego', 'Kościuszki', 'Piłsudskiego', 'Kopernika', 'Sienkiewicza',
+           'Wielicka', 'Kalwaryjska', 'Lea', 'Królewska', 'Dworcowa', 'Ogrodowa', 'Lipowa', 'Polna',
+           'Leśna', 'Słoneczna', 'Krótka', 'Szkolna', 'Kwiatowa', 'Batorego', 'Jagiellońska',
+           'Wrocławska', 'Zamojska', 'Marszałkowska', 'Puławska', 'Grochowska', 'Woronicza']
+BRANCH_RATE = 0.05 # Share of businesses that are another branch of a chain (same name and website)
+SYLLABLES = ['ko', 'wal', 'ski', 'no', 'wak', 'lew', 'an', 'dro', 'zie', 'lin', 'mar', 'czyk',
+             'pa', 'ryk', 'sze', 'wicz', 'ba', 'ran', 'tek', 'go', 'rec', 'du', 'dek', 'mi']
+
+def city_name(number):
+    """Returns a made-up town name for a city number."""
+    syllables = []
+    while True:
+        number, digit = divmod(number, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+        if not number:
+            break
+    return ''.join(syllables).capitalize() + 'ów'
+
+def make_business(rng, i):
+    """Builds one business with a random surname, street and phone."""
+    surname = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    name = f"{rng.choice(KINDS)} {rng.choice(FIRST_NAMES)} {surname}"
+    street = f"{rng.choice(STREETS)} {rng.randint(1, 300)}"
+    # Multi-city runs: about one city per thousand businesses
+    city = CITIES[i % len(CITIES)] if i < 6000 else city_name(i // 1000)
+    return {
+        'id': i,
+        'name': name + rng.choice(SUFFIXES),
+        'formatted_address': f"ul. {street}, {rng.randint(10, 99)}-{rng.randint(100, 999)} {city}",
+        'formatted_phone_number': f"12 {rng.randint(100, 999)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+        'website': f"https://firma{i}.pl" if rng.random() < 0.6 else "",
+        'emails': [],
+    }
+
+def make_variant(rng, business, branch_id=None):
+    """Builds the same business as another source would list it.
+
+    With branch_id, builds another branch of the chain instead: same name and
+    website, its own street and phone. It must not be merged with business.
+    """
+    variant = dict(business, emails=[])
+    if branch_id is not None:
+        city = business['formatted_address'].rsplit(' ', 1)[-1]
+        variant.update({
+            'id': branch_id,
+            'formatted_address': f"ul. {rng.choice(STREETS)} {rng.randint(1, 300)}, "
+                                 f"{rng.randint(10, 99)}-{rng.randint(100, 999)} {city}",
+            'formatted_phone_number': f"12 {rng.randint(100, 999)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+        })
+        return variant
+    words = business['name'].split()
+    if rng.random() < 0.5:
+        words = words[-1:] + ['–'] + words[:-1] # "Anna – Salon Fryzjerski"
+    variant['name'] = ' '.join(words)
+    if rng.random() < 0.5:
+        variant['formatted_address'] = business['formatted_address'].replace('ul. ', '')
+    if rng.random() < 0.5:
+        variant['formatted_phone_number'] = '+48' + business['formatted_phone_number'].replace(' ', '')
+    if rng.random() < 0.3:
+        variant['website'] = ""
+    return variant
+
+def make_records(count, duplicate_rate, seed=1):
+    """Returns shuffled records where roughly duplicate_rate of them are variants of others."""
+    rng = random.Random(seed)
+    records = []
+    businesses = int(count / (1 + duplicate_rate))
+    for i in range(businesses):
+        if records and rng.random() < BRANCH_RATE:
+            chain = records[rng.randrange(len(records))]
+            if chain['website']:
+                records.append(make_variant(rng, chain, branch_id=i))
+                continue
+        records.append(make_business(rng, i))
+    while len(records) < count:
+        records.append(make_variant(rng, records[rng.randrange(businesses)]))
+    rng.shuffle(records)
+    return records, businesses
+
+def run(count, duplicate_rate):
+    records, businesses = make_records(count, duplicate_rate)
+    deduplicator = Deduplicator()
+    start = time.perf_counter()
+    kept = [record for record in records if deduplicator.add(record)]
+    elapsed = time.perf_counter() - start
+
+    kept_ids = [record['id'] for record in kept]
+    distinct_kept = len(set(kept_ids))
+    missed = len(kept_ids) - distinct_kept # Duplicates that survived
+    wrongly_merged = businesses - distinct_kept # Businesses lost by merging with another
+    exact_kept = len({record_key(record) for record in records})
+    print(f"{count:>8} {elapsed:8.2f} {count / elapsed:10.0f} {businesses:>10} {len(kept):>8} "
+          f"{missed:>7} {wrongly_merged:>7} {exact_kept:>10}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy deduplication scaling.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--duplicate-rate', type=float, default=0.4, help="Extra variant records per business")
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'seconds':>8} {'records/s':>10} {'businesses':>10} {'kept':>8} "
+          f"{'missed':>7} {'merged':>7} {'exact-key':>10}")
+    timings = [(size, run(size, args.duplicate_rate)) for size in args.sizes]
+    if len(timings) > 1:
+        (small, small_time), (large, large_time) = timings[0], timings[-1]
+        print(f"\n{large / small:.0f}x more records took {large_time / small_time:.1f}x longer")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import domain_cache
+import http_cache
+import http_client
+from benchmarks.bench_enrichment import enrich_records
+from benchmarks.fixtures import contact_site
+from benchmarks.mock_server import MockServer
+from scraper import extract_emails_from_website
+
+# Website crawls and enrichment time for leads that share domains (chain
+# branches), point at dead domains or at social profiles: without the domain
+# cache, with an empty one (first run) and with a filled one (next run).
+# Run from the repository root: python -m benchmarks.bench_domain_cache
+
+def make_sites(sites, branches):
+    """Returns {host: {path: html}}: every site also serves a page per branch (/salon-1, /salon-2, ...)."""
+    pages = {}
+    for site_id in range(sites):
+        site_pages, _ = contact_site(site_id)
+        for branch in range(1, branches):
+            site_pages[f"/salon-{branch}"] = site_pages['/']
+        pages[f"127.0.0.{site_id + 1}"] = site_pages
+    return pages
+
+def make_records(server, sites, branches, dead, social):
+    """Builds records: every branch of every site, then dead domains and social profiles."""
+    records = []
+    for site_id in range(sites):
+        for branch in range(branches):
+            path = f"salon-{branch}" if branch else ''
+            records.append({'name': f"Firma {site_id}/{branch}", 'website': server.host_url(site_id) + path})
+    records += [{'name': f"Martwa {i}", 'website': f"http://salon-{i}.invalid/"} for i in range(dead)]
+    records += [{'name': f"Profil {i}", 'website': f"https://www.facebook.com/salon{i}"} for i in range(social)]
+    return records
+
+def run(label, server, records):
+    # Every row stands for a new process: no circuit breaker remembers the dead domains
+    http_client._throttles.clear()
+    domain_cache.reset_domain_stats()
+    requests_before = server.requests
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        enrich_records(records, extract_emails_from_website, host_delay=(0.0, 0.0))
+    elapsed = time.perf_counter() - start
+    stats = domain_cache.domain_stats()
+    with_emails = sum(1 for record in records if record.get('emails'))
+    print(f"{label:<9} {stats['crawled']:8d} {server.requests - requests_before:9d} "
+          f"{stats['reused'] + stats['failures_reused']:7d} {stats['skipped_hosts']:8d} {with_emails:9d} "
+          f"{elapsed:8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-domain crawl cache over two runs.")
+    parser.add_argument('--sites', type=int, default=60, help="Distinct business websites (at most 254)")
+    parser.add_argument('--branches', type=int, default=3, help="Leads (branch pages) per website")
+    parser.add_argument('--dead', type=int, default=20, help="Leads whose domain does not resolve")
+    parser.add_argument('--social', type=int, default=20, help="Leads whose website is a Facebook profile")
+    parser.add_argument('--latency', type=float, default=0.05, help="Server latency per request in seconds")
+    args = parser.parse_args()
+
+    http_cache.configure_cache(enabled=False) # Only the domain cache saves requests here
+    http_client.THROTTLE_SETTINGS['websites'] = {'rate': 1000.0, 'min_rate': 1000.0, 'max_rate': 1000.0, 'burst': 100}
+    sites = min(args.sites, 254)
+    with MockServer(latency=args.latency, pages=make_sites(sites, args.branches)) as server, \
+            tempfile.TemporaryDirectory() as directory:
+        leads = sites * args.branches + args.dead + args.social
+        print(f"{leads} leads: {sites} sites x {args.branches} branches, {args.dead} dead domains, "
+              f"{args.social} social profiles\n")
+        print(f"{'cache':<9} {'crawled':>8} {'requests':>9} {'reused':>7} {'skipped':>8} {'w/ email':>9} "
+              f"{'seconds':>8}")
+        make = lambda: make_records(server, sites, args.branches, args.dead, args.social)
+        domain_cache.configure_domain_cache(enabled=False)
+        run('none', server, make())
+        domain_cache.configure_domain_cache(enabled=True, path=os.path.join(directory, 'domains.sqlite'))
+        run('cold', server, make())
+        run('warm', server, make())
+        domain_cache.configure_domain_cache(enabled=False) # Closes the database before the directory goes
+    http_client.close_sessions()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import html
+import re
+import time
+
+from email_extractor import scan_html
+from benchmarks.fixtures import load_email_corpus
+
+# Throughput (MB/s) and recall/precision of the email extraction engine
+# against the previous regex-and-filter approach.
+# Run from the repository root: python -m benchmarks.bench_emails
+
+LEGACY_EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b'
+LEGACY_BLOCKED = ['example.com', 'domain.com', 'yourmail.com', 'wixpress.com', 'sentry.io']
+LEGACY_HREF_PATTERN = re.compile(r'''<a\b[^>]*?\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+LEGACY_DATA_EMAIL_PATTERN = re.compile(r'''\bdata-email\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+
+def legacy_values(pattern, markup):
+    """Yields the HTML-unescaped attribute values a pattern finds in raw HTML."""
+    for match in pattern.finditer(markup):
+        yield html.unescape(match.group(1) or match.group(2) or match.group(3) or '')
+
+def legacy_scan_page(markup):
+    """The previous single-pass scan: raw regex, links, data-email attributes, substring filter."""
+    emails = re.findall(LEGACY_EMAIL_PATTERN, markup)
+    hrefs = [href for href in legacy_values(LEGACY_HREF_PATTERN, markup) if href]
+    for data_email in legacy_values(LEGACY_DATA_EMAIL_PATTERN, markup):
+        if data_email and '@' in data_email:
+            emails.append(data_email)
+    emails = [email for email in set(emails) if not any(domain in email.lower() for domain in LEGACY_BLOCKED)]
+    return emails, hrefs
+
+def measure(label, scan, corpus, min_time):
+    total_bytes = sum(len(markup.encode('utf-8')) for markup, _ in corpus)
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        results = [scan(markup)[0] for markup, _ in corpus]
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    expected = found = reported = 0
+    for (_, wanted), emails in zip(corpus, results):
+        wanted = {email.lower() for email in wanted}
+        emails = {email.lower() for email in emails}
+        expected += len(wanted)
+        found += len(wanted & emails)
+        reported += len(emails)
+    mb_per_second = total_bytes * runs / elapsed / 2**20
+    print(f"{label:<12} {mb_per_second:8.1f} {found / max(expected, 1):8.1%} {found / max(reported, 1):10.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email extraction speed and recall.")
+    parser.add_argument('--fixtures', help="Directory with email_*.html pages and email_*.txt expected addresses")
+    parser.add_argument('--pages', type=int, default=20, help="Synthetic pages when no fixtures are given")
+    parser.add_argument('--size-kb', type=int, default=100, help="Size of each synthetic page")
+    parser.add_argument('--min-time', type=float, default=2.0, help="Seconds to run each measurement")
+    args = parser.parse_args()
+
+    corpus = load_email_corpus(args.fixtures, args.pages, args.size_kb)
+    size = sum(len(markup) for markup, _ in corpus) / 2**20
+    print(f"{len(corpus)} pages, {size:.1f} MB\n")
+    print(f"{'extractor':<12} {'MB/s':>8} {'recall':>8} {'precision':>10}")
+    measure('legacy', legacy_scan_page, corpus, args.min_time)
+    measure('engine', scan_html, corpus, args.min_time)
+
+if __name__ == '__main__':
+    main()
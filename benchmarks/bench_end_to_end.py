@@ -0,0 +1,114 @@
+import argparse
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+
+import crawler
+import domain_cache
+import http_cache
+import http_client
+import metrics
+import scraper
+from benchmarks.fixtures import load_fixtures
+from benchmarks.mock_server import PLACE_DETAILS_PATH, PLACES_NEARBY_PATH, PLACES_TEXTSEARCH_PATH, MockServer
+
+# A whole run (Panorama Firm, PKT.pl, Google Places, deduplication and email
+# enrichment) against the local stand-in server: throughput, time per stage
+# and peak memory. Save the summary with --json to compare versions.
+# Run from the repository root: python -m benchmarks.bench_end_to_end
+
+def point_scraper_at(server, token_delay):
+    """Sends the directory and Places API requests of the scraper to the stand-in server."""
+    base_url = server.base_url()
+    scraper.PANORAMA_URL = base_url
+    scraper.PKT_URL = base_url
+    scraper.PLACES_TEXTSEARCH_URL = base_url + PLACES_TEXTSEARCH_PATH
+    scraper.PLACES_NEARBY_URL = base_url + PLACES_NEARBY_PATH
+    scraper.PLACE_DETAILS_URL = base_url + PLACE_DETAILS_PATH
+    scraper.API_KEY = scraper.API_KEY or 'benchmark'
+    scraper.GOOGLE_PAGE_TOKEN_DELAY = token_delay
+
+def run(server, use_google, fetch_emails, shard=False):
+    """Runs the streaming pipeline once. Returns (records, records with emails, seconds, peak bytes)."""
+    records = []
+    metrics.reset_metrics()
+    crawler.reset_site_stats()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with metrics.stage('pipeline'):
+            scraper.run_pipeline(scraper.make_sources('fryzjer', 'Kraków', use_google, shard=shard), records.append,
+                                 scraper.extract_emails_from_website if fetch_emails else None)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with_emails = sum(1 for record in records if record.get('emails'))
+    return len(records), with_emails, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a full run against a local stand-in for every source.")
+    parser.add_argument('--fixtures', help="Directory with recorded panorama_*.html and pkt_*.html listing pages")
+    parser.add_argument('--latency', type=float, default=0.05, help="Server latency per request in seconds")
+    parser.add_argument('--jitter', type=float, default=0.05, help="Random extra latency up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument('--listing-pages', type=int, default=3, help="Result pages per directory")
+    parser.add_argument('--listing-size', type=int, default=25, help="Businesses per directory page")
+    parser.add_argument('--places-pages', type=int, default=3, help="Places textsearch pages")
+    parser.add_argument('--places-size', type=int, default=20, help="Places per textsearch page")
+    parser.add_argument('--token-delay', type=float, default=2.0, help="Seconds before a next_page_token is valid")
+    parser.add_argument('--overlap', type=float, default=0.5, help="Share of businesses listed by several sources")
+    parser.add_argument('--places-density', type=float,
+                        help="Places per square km found by nearby searches (used with --shard)")
+    parser.add_argument('--shard', action='store_true', help="Search by district and on a grid (see sharding.py)")
+    parser.add_argument('--hosts', type=int, default=254, help="Loopback hosts the business websites are spread over")
+    parser.add_argument('--no-google', action='store_true', help="Leave out the Places API")
+    parser.add_argument('--no-emails', action='store_true', help="Leave out website crawling")
+    parser.add_argument('--no-throttle', action='store_true', help="Lift the per-host rate limits")
+    parser.add_argument('--json', metavar='FILE', help="Save the summary and run metrics to a JSON file")
+    args = parser.parse_args()
+
+    http_cache.configure_cache(enabled=False) # Measure the network path, not the disk cache
+    domain_cache.configure_domain_cache(enabled=False)
+    if args.no_throttle:
+        for source in http_client.THROTTLE_SETTINGS:
+            http_client.THROTTLE_SETTINGS[source] = {'rate': 1000.0, 'min_rate': 1000.0, 'max_rate': 1000.0,
+                                                     'burst': 100}
+    listings = None
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+        listings = {'panorama': fixtures['panorama'], 'pkt': fixtures['pkt']}
+
+    with MockServer(latency=args.latency, jitter=args.jitter, hosts=args.hosts, error_rate=args.error_rate,
+                    listing_pages=args.listing_pages, listing_size=args.listing_size, listings=listings,
+                    places_pages=args.places_pages, places_size=args.places_size, token_delay=args.token_delay,
+                    overlap=args.overlap, places_density=args.places_density) as server:
+        point_scraper_at(server, args.token_delay)
+        print(f"Stand-in server: {args.latency:.2f}+{args.jitter:.2f} s latency, {args.error_rate:.0%} errors, "
+              f"{args.listing_pages}x{args.listing_size} directory results, "
+              f"{0 if args.no_google else args.places_pages * args.places_size} places")
+        records, with_emails, elapsed, peak = run(server, not args.no_google, not args.no_emails, args.shard)
+        requests_sent, errors = server.requests, server.errors
+    http_client.close_sessions()
+
+    summary = {
+        'records': records, 'records_with_emails': with_emails, 'seconds': round(elapsed, 3),
+        'records_per_second': round(records / elapsed, 2) if elapsed else 0.0,
+        'peak_mib': round(peak / 2 ** 20, 2), 'server_requests': requests_sent, 'server_errors': errors,
+    }
+    print(f"\n{'records':>8} {'w/ email':>8} {'seconds':>8} {'records/s':>10} {'peak MiB':>9} {'requests':>9} {'500s':>5}")
+    print(f"{records:8d} {with_emails:8d} {elapsed:8.2f} {summary['records_per_second']:10.2f} "
+          f"{summary['peak_mib']:9.1f} {requests_sent:9d} {errors:5d}")
+    metrics.print_run_profile()
+    crawler.print_site_stats()
+    if args.json:
+        report = metrics.metrics_report(summary=summary, options=vars(args),
+                                        connections=http_client.connection_stats(),
+                                        websites=crawler.site_stats().as_dict())
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.json}")
+
+if __name__ == '__main__':
+    main()
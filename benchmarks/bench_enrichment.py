@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import domain_cache
+import enrichment
+import http_cache
+import http_client
+from scraper import extract_emails_from_website
+from benchmarks.mock_server import MockServer
+
+# Compares the old sequential enrichment loop with the async engine.
+# Run from the repository root: python -m benchmarks.bench_enrichment
+
+def make_records(server, sites):
+    """Builds merged-looking records pointing at synthetic websites."""
+    return [
+        {'name': f"Firma {i}", 'website': server.site_url(i), 'emails': []}
+        for i in range(sites)
+    ]
+
+async def _enrich_all(records, fetch_emails, **kwargs):
+    enricher = enrichment.Enricher(fetch_emails, **kwargs)
+    try:
+        await asyncio.gather(*(enricher.enrich(result) for result in records if result.get('website')))
+    finally:
+        enricher.close()
+
+def enrich_records(records, fetch_emails, **kwargs):
+    """Fills the emails of every record with a website through one Enricher (kwargs as for Enricher)."""
+    asyncio.run(_enrich_all(records, fetch_emails, **kwargs))
+
+def run_sequential(records, host_delay):
+    """Replicates the previous main() loop: one site at a time plus a global sleep."""
+    for result in records:
+        result['emails'] = extract_emails_from_website(result['website']) or []
+        time.sleep(sum(host_delay) / 2)
+
+def run_async(records, concurrency, per_host, host_delay):
+    """Runs the async enrichment engine."""
+    enrich_records(records, extract_emails_from_website, max_concurrency=concurrency,
+                   per_host_concurrency=per_host, host_delay=host_delay)
+
+def timed(label, func, *args):
+    """Runs func with its console output silenced and returns the elapsed time."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed:8.2f} s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email enrichment against a local stand-in server.")
+    parser.add_argument('--sites', type=int, default=60, help="Number of synthetic business websites")
+    parser.add_argument('--hosts', type=int, default=30, help="Number of distinct hosts the sites are spread over")
+    parser.add_argument('--latency', type=float, default=0.3, help="Server latency per request in seconds")
+    parser.add_argument('--concurrency', type=int, default=enrichment.MAX_CONCURRENCY)
+    parser.add_argument('--per-host', type=int, default=enrichment.PER_HOST_CONCURRENCY)
+    parser.add_argument('--host-delay', type=float, nargs=2, default=list(enrichment.HOST_DELAY))
+    parser.add_argument('--skip-sequential', action='store_true', help="Only run the async engine")
+    args = parser.parse_args()
+
+    host_delay = tuple(args.host_delay)
+    http_cache.configure_cache(enabled=False) # Measure the network path, not the disk cache
+    domain_cache.configure_domain_cache(enabled=False)
+    with MockServer(latency=args.latency, hosts=args.hosts) as server:
+        print(f"{args.sites} sites on {server.hosts} hosts, {args.latency:.2f} s latency, host delay {host_delay}")
+
+        async_records = make_records(server, args.sites)
+        async_time = timed("async", run_async, async_records, args.concurrency, args.per_host, host_delay)
+
+        if not args.skip_sequential:
+            seq_records = make_records(server, args.sites)
+            seq_time = timed("sequential", run_sequential, seq_records, host_delay)
+            same = all(sorted(a['emails']) == sorted(b['emails']) for a, b in zip(async_records, seq_records))
+            print(f"speedup      {seq_time / async_time:8.1f}x")
+            print(f"same emails  {'yes' if same else 'NO'}")
+
+        print(f"requests     {server.requests:8d}")
+        counts = http_client.connection_stats().get('websites', {})
+        print(f"connections  {counts.get('connections', 0):8d} (reused {counts.get('reused', 0)})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+from exporters import FORMATS, HEADERS, MAX_COLUMN_WIDTH, export, record_to_row
+from benchmarks.bench_dedup import make_records
+
+# Throughput and peak memory of each output format.
+# Run from the repository root: python -m benchmarks.bench_export
+
+def export_in_memory_xlsx(records, path):
+    """The previous exporter: a normal workbook built in memory, widths measured afterwards."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(HEADERS)
+    count = 0
+    for record in records:
+        ws.append(record_to_row(record))
+        count += 1
+    for column in ws.columns:
+        width = max(len(str(cell.value or '')) for cell in column)
+        ws.column_dimensions[get_column_letter(column[0].column)].width = min(width + 2, MAX_COLUMN_WIDTH)
+    wb.save(path)
+    return count
+
+def with_emails(records):
+    """Yields records with a few emails each, like an enriched run."""
+    for i, record in enumerate(records):
+        yield dict(record, emails=[f"kontakt{j}@firma{i}.pl" for j in range(i % 5)])
+
+def measure(label, write, records, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        count = write(with_emails(records), path)
+    except RuntimeError as e:
+        tracemalloc.stop()
+        print(f"{label:>16} skipped: {e}")
+        return
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    print(f"{label:>16} {count:>8} {elapsed:8.2f} {count / elapsed:10.0f} {peak / 2**20:9.1f} {size / 2**20:8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the output formats.")
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--no-baseline', action='store_true', help="Skip the in-memory openpyxl baseline")
+    args = parser.parse_args()
+
+    records, _ = make_records(args.records, duplicate_rate=0)
+    print(f"{'format':>16} {'records':>8} {'seconds':>8} {'records/s':>10} {'peak MiB':>9} {'file MiB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.no_baseline:
+            measure('xlsx (in-memory)', export_in_memory_xlsx, records, os.path.join(directory, 'baseline.xlsx'))
+        for fmt in args.formats:
+            measure(fmt, lambda data, path, fmt=fmt: export(data, path, fmt), records,
+                    os.path.join(directory, 'results.' + fmt))
+
+if __name__ == '__main__':
+    main()
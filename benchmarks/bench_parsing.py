@@ -0,0 +1,49 @@
+import argparse
+import contextlib
+import io
+import time
+
+import parsers
+import scraper
+from benchmarks.fixtures import load_fixtures
+
+# Pages per second for each parser backend on listing and homepage fixtures.
+# Run from the repository root: python -m benchmarks.bench_parsing
+
+def pages_per_second(func, pages, min_time):
+    """Runs func over the pages repeatedly for at least min_time seconds."""
+    count = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            for page in pages:
+                func(page)
+            count += len(pages)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                return count / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parser backends on saved pages.")
+    parser.add_argument('--fixtures', help="Directory with panorama_*.html, pkt_*.html and site_*.html files")
+    parser.add_argument('--min-time', type=float, default=1.0, help="Seconds to run each measurement")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    site_kb = sum(len(page) for page in fixtures['site']) / len(fixtures['site']) / 1024
+    print(f"Fixtures: {len(fixtures['panorama'])} Panorama, {len(fixtures['pkt'])} PKT, "
+          f"{len(fixtures['site'])} homepages (~{site_kb:.0f} KB)")
+    print(f"{'backend':<14} {'panorama/s':>11} {'pkt/s':>9} {'homepage/s':>11}")
+
+    for backend in parsers.available_backends():
+        parsers.PARSER_BACKEND = backend
+        panorama = pages_per_second(scraper._parse_panorama_page, fixtures['panorama'], args.min_time)
+        pkt = pages_per_second(scraper._parse_pkt_page, fixtures['pkt'], args.min_time)
+        site = pages_per_second(lambda page: scraper.scan_page(page, mode='tree'), fixtures['site'], args.min_time)
+        print(f"{backend:<14} {panorama:11.1f} {pkt:9.1f} {site:11.1f}")
+
+    single = pages_per_second(lambda page: scraper.scan_page(page, mode='single-pass'), fixtures['site'], args.min_time)
+    print(f"{'single-pass':<14} {'-':>11} {'-':>9} {single:11.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import crawler
+import http_cache
+import http_client
+import scraper
+from benchmarks.fixtures import contact_site
+from benchmarks.mock_server import MockServer, Stream
+
+# Peak memory and per-site time of website crawls when some sites serve huge
+# pages, PDFs or slow endless streams, with bounded streamed reads compared to
+# reading every whole response.
+# Run from the repository root: python -m benchmarks.bench_site_fetch
+
+FILLER = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 1100 + "</p>\n" # ~64 KiB
+
+def problem_site(site_id, huge_mb, slow_seconds):
+    """Returns the pages of a site; every 20th site of each kind misbehaves."""
+    pages, _ = contact_site(site_id)
+    kind = site_id % 20
+    if kind == 5: # A homepage of many megabytes
+        pages['/'] = Stream(f"<html><body>info{site_id}@firma{site_id}.pl" + FILLER, huge_mb * 16)
+    elif kind == 10: # The contact link leads to a PDF
+        for path in pages:
+            if 'kontakt' in path:
+                pages[path] = Stream(b'%PDF-1.4\n' + b'\x00' * 65536, 64, content_type='application/pdf')
+    elif kind == 15: # A homepage trickling in forever
+        pages['/'] = Stream(f"<html><body>info{site_id}@firma{site_id}.pl <p>{'x' * 1000}</p>",
+                            int(slow_seconds / 0.2), interval=0.2)
+    return pages
+
+def legacy_fetch(url, max_bytes, deadline):
+    """The previous fetch: the whole response read with a 15 s socket timeout, whatever its type."""
+    response = http_client.get_session('websites').get(url, timeout=15)
+    response.raise_for_status()
+    return response.url, response.text, len(response.content), True
+
+def run(label, fetch_page, sites, workers, deadline):
+    pages = {f"127.0.0.{i % 254 + 1}": site_pages for i, site_pages in enumerate(sites)}
+    crawler.reset_site_stats()
+    with MockServer(pages=pages) as server:
+        def crawl(i):
+            try:
+                crawler.crawl_site(server.host_url(i), fetch_page, scraper.scan_page, max_seconds=deadline)
+            except Exception:
+                pass
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        # sys.stdout is process-wide: redirect it once around all threads
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(crawl, range(len(sites))))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    http_client.close_sessions()
+    stats = crawler.site_stats()
+    print(f"{label:<10} {peak / 2 ** 20:9.1f} {sum(stats.bytes) / 2 ** 20:9.1f} "
+          f"{crawler.percentile(stats.seconds, 0.5):7.2f} {crawler.percentile(stats.seconds, 0.95):7.2f} "
+          f"{max(stats.seconds):7.2f} {elapsed:8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bounded website reads against misbehaving sites.")
+    parser.add_argument('--sites', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=16, help="Sites crawled at the same time")
+    parser.add_argument('--huge-mb', type=int, default=8, help="Size of the oversized homepages")
+    parser.add_argument('--slow-seconds', type=float, default=20.0, help="How long the trickling homepages last")
+    parser.add_argument('--deadline', type=float, default=5.0, help="Per-site deadline of the bounded crawler")
+    args = parser.parse_args()
+
+    http_cache.configure_cache(enabled=False)
+    # Pacing is not what is measured here
+    http_client.THROTTLE_SETTINGS['websites'] = {'rate': 1000.0, 'min_rate': 1000.0, 'max_rate': 1000.0, 'burst': 100}
+    sites = [problem_site(site_id, args.huge_mb, args.slow_seconds) for site_id in range(args.sites)]
+    print(f"{args.sites} sites, 15% misbehaving, {args.workers} workers; bounded: "
+          f"{crawler.MAX_PAGE_BYTES // 1024} KiB per page, {args.deadline:.0f} s per site\n")
+    print(f"{'fetch':<10} {'peak MiB':>9} {'read MiB':>9} {'p50 s':>7} {'p95 s':>7} {'max s':>7} {'seconds':>8}")
+    run('legacy', legacy_fetch, sites, args.workers, float('inf'))
+    run('bounded', scraper._fetch_site_page, sites, args.workers, args.deadline)
+
+if __name__ == '__main__':
+    main()
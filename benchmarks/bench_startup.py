@@ -0,0 +1,101 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup time of the scraper: the import profile of scraper.py (python -X
+# importtime), the time until `scraper.py --help` returns, and the same for
+# the PyInstaller executable when one has been built. Each is checked
+# against a budget; the exit status is 1 when one is over.
+# Run from the repository root: python -m benchmarks.bench_startup
+
+IMPORT_BUDGET = 0.2   # Seconds to import scraper.py
+SCRIPT_BUDGET = 0.35  # Seconds for `python scraper.py --help`, interpreter startup included
+EXE_BUDGET = 1.5      # Seconds for `scraper --help` from the packaged executable (first launch included)
+# Imported by the stages that need them, never at startup
+DEFERRED_MODULES = ('openpyxl', 'bs4', 'lxml', 'selectolax', 'pyarrow', 'pyinstrument', 'cProfile')
+# In the build environment but not used by the scraper; scraper.spec excludes them
+UNUSED_MODULES = ('pandas', 'numpy', 'selenium', 'undetected_chromedriver', 'PySimpleGUI', 'tkinter', 'trio')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_profile():
+    """Imports scraper in a fresh interpreter. Returns (seconds, {top-level module: cumulative seconds})."""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import scraper'], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stderr
+    modules = {}
+    total = 0.0
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        seconds = int(cumulative) / 1e6
+        if name.strip() == 'scraper':
+            total = seconds
+        elif name.startswith('   ') and not name.startswith('    '): # Imported by scraper itself
+            modules[name.strip()] = seconds
+        root = name.strip().split('.')[0]
+        if name.strip() == root and (root in DEFERRED_MODULES or root in UNUSED_MODULES):
+            modules.setdefault(root, seconds)
+    return total, modules
+
+def time_command(command, runs):
+    """Runs a command runs times. Returns the seconds of every run."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+def check(label, seconds, budget):
+    """Prints a measurement against its budget and returns True if it is within it."""
+    within = seconds <= budget
+    print(f"{label:<28} {seconds * 1000:8.0f} ms  budget {budget * 1000:6.0f} ms  {'ok' if within else 'OVER'}")
+    return within
+
+def default_exe():
+    """Returns the executable built by `pyinstaller scraper.spec`, or None if there is none."""
+    for name in ('scraper.exe', 'scraper'):
+        path = os.path.join(ROOT, 'dist', name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scraper startup time against budgets.")
+    parser.add_argument('--runs', type=int, default=5, help="Launches per measurement; the median is reported")
+    parser.add_argument('--exe', help="Packaged executable to time (default: dist/scraper[.exe] if built)")
+    parser.add_argument('--top', type=int, default=10, help="Slowest imports listed")
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    total = statistics.median(seconds for seconds, _ in profiles)
+    modules = profiles[-1][1]
+    print("=== Imports of scraper.py (python -X importtime) ===")
+    for name, seconds in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<28} {seconds * 1000:8.1f} ms")
+    loaded = [name for name in DEFERRED_MODULES + UNUSED_MODULES if name in modules]
+    if loaded:
+        print(f"Imported at startup although not needed yet: {', '.join(loaded)}")
+
+    print(f"\n=== Startup (median of {args.runs}) ===")
+    ok = check('import scraper', total, IMPORT_BUDGET)
+    interpreter = statistics.median(time_command([sys.executable, '-c', 'pass'], args.runs))
+    print(f"{'python -c pass':<28} {interpreter * 1000:8.0f} ms")
+    script = time_command([sys.executable, 'scraper.py', '--help'], args.runs)
+    ok = check('python scraper.py --help', statistics.median(script), SCRIPT_BUDGET) and ok
+
+    exe = args.exe or default_exe()
+    if exe:
+        # The first launch of a one-file build also unpacks it; later ones hit the OS file cache
+        times = time_command([exe, '--help'], args.runs)
+        ok = check('executable --help (first)', times[0], EXE_BUDGET) and ok
+        ok = check('executable --help', statistics.median(times), EXE_BUDGET) and ok
+    else:
+        print("No executable found (build one with: pyinstaller scraper.spec)")
+    sys.exit(0 if ok and not loaded else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_cache
+import http_client
+from benchmarks.mock_server import MockServer
+
+# Fixed-rate requests vs the adaptive per-host limiter against a server that
+# answers 429 above a given rate, plus the circuit breaker on a failing host.
+# Run from the repository root: python -m benchmarks.bench_throttle
+
+def fetch_all(get, urls, workers):
+    """Fetches urls with a thread pool. Returns (ok, failed) counts."""
+    def fetch(url):
+        try:
+            response = get(url)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fetch, urls))
+    return sum(results), len(results) - sum(results)
+
+def run_fixed(server, urls, workers, rate):
+    """Previous behaviour: requests at a fixed rate with no retries; a 429 loses the page."""
+    session = requests.Session()
+    interval = 1 / rate
+    next_slot = [time.monotonic()]
+
+    def get(url):
+        # Simple shared schedule, one request every `interval` seconds
+        slot = next_slot[0] = max(next_slot[0] + interval, time.monotonic())
+        time.sleep(max(slot - interval - time.monotonic(), 0))
+        return session.get(url, timeout=10)
+
+    return fetch_all(get, urls, workers)
+
+def run_adaptive(server, urls, workers):
+    """Shared session with the adaptive limiter, retries and circuit breaker."""
+    session = http_client.get_session('websites')
+    return fetch_all(lambda url: session.get(url), urls, workers)
+
+def report(label, server, elapsed, ok, failed):
+    print(f"{label:<10} {elapsed:8.2f} {ok / elapsed:8.2f} {ok:>5} {failed:>7} {server.refused:>8} {server.requests:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive throttling against a throttling stand-in server.")
+    parser.add_argument('--pages', type=int, default=120)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--server-rate', type=float, default=8.0, help="Requests/s the server accepts per host")
+    parser.add_argument('--fixed-rate', type=float, default=12.0, help="Rate of the fixed-rate client")
+    args = parser.parse_args()
+
+    http_cache.configure_cache(enabled=False)
+    http_client.THROTTLE_SETTINGS['websites'] = {'rate': 2.0, 'min_rate': 0.5, 'max_rate': 50.0, 'burst': 2}
+    print(f"Server accepts {args.server_rate:.1f} requests/s, {args.pages} pages, {args.workers} workers\n")
+    print(f"{'client':<10} {'seconds':>8} {'pages/s':>8} {'ok':>5} {'failed':>7} {'refused':>8} {'requests':>9}")
+
+    with MockServer(throttle_rate=args.server_rate, retry_after=1) as server:
+        urls = [server.site_url(i) for i in range(args.pages)]
+        start = time.perf_counter()
+        ok, failed = run_fixed(server, urls, args.workers, args.fixed_rate)
+        report('fixed', server, time.perf_counter() - start, ok, failed)
+
+    with MockServer(throttle_rate=args.server_rate, retry_after=1) as server:
+        urls = [server.site_url(i) for i in range(args.pages)]
+        start = time.perf_counter()
+        ok, failed = run_adaptive(server, urls, args.workers)
+        report('adaptive', server, time.perf_counter() - start, ok, failed)
+        limiter = http_client.host_throttle('websites', '127.0.0.1').limiter
+        print(f"\nAdaptive limiter settled at {limiter.rate:.1f} requests/s after {limiter.throttled} throttling responses")
+
+    # A host that always fails: the breaker stops sending after BREAKER_FAILURES failures
+    http_client.BACKOFF_BASE = 0.05
+    with MockServer(failing_hosts={'127.0.0.1'}) as server:
+        urls = [server.site_url(i) for i in range(20)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok, failed = fetch_all(lambda url: http_client.get_session('websites').get(url), urls, 1)
+        breaker = http_client.host_throttle('websites', '127.0.0.1').breaker
+        print(f"Failing host: {len(urls)} pages, {server.requests} requests sent, circuit {breaker.state}")
+    http_client.close_sessions()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+import os
+import random
+
+# Synthetic HTML shaped like the pages the scraper parses. Real pages saved
+# from the sites can be dropped into a fixture directory instead, named
+# panorama_*.html, pkt_*.html and site_*.html.
+
+STREETS = ['Długa', 'Floriańska', 'Grodzka', 'Karmelicka', 'Starowiślna', 'Dietla', 'Zwierzyniecka']
+WORDS = ['Salon', 'Fryzjer', 'Studio', 'Barber', 'Usługi', 'Kosmetyka', 'Anna', 'Jan', 'Nowak', 'Kowalski']
+
+def business_name(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(3))
+
+def listing_business(site_id, seed=0):
+    """Returns the name, street, phone and description of a synthetic business.
+
+    The same site_id gives the same business, so the directories and the
+    Places API stand-in list duplicates the way the real sources do.
+    """
+    rng = random.Random(seed * 100000 + site_id)
+    return {
+        'name': business_name(rng),
+        'street': f"ul. {rng.choice(STREETS)} {rng.randint(1, 120)}",
+        'postcode': f"31-{rng.randint(100, 999)}",
+        'phone': f"12 {rng.randint(100, 999)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+        'description': ' '.join(rng.choice(WORDS) for _ in range(40)),
+    }
+
+def panorama_listing_html(page=1, count=25, seed=0, site_url=None, first_id=None):
+    """Builds a Panorama Firm search results page.
+
+    site_url(site_id) gives the website of each business (https://firmaN.pl/ by
+    default); businesses are numbered from first_id (page * 100 by default).
+    """
+    first_id = page * 100 if first_id is None else first_id
+    cards = []
+    for site_id in range(first_id, first_id + count):
+        business = listing_business(site_id, seed)
+        website = site_url(site_id) if site_url else f"https://firma{site_id}.pl/"
+        cards.append(f"""
+<div class="card company-item" data-id="{site_id}">
+  <div class="row"><div class="col">
+    <h2 class="company-name"><a href="/firma/{site_id}">{business['name']}</a></h2>
+    <div class="address">{business['street']}, {business['postcode']} Kraków</div>
+    <a class="icon-phone" data-company-phone="{business['phone']}">Pokaż numer</a>
+    <a class="icon-website" href="{website}">www</a>
+    <p class="description">{business['description']}</p>
+  </div></div>
+</div>""")
+    return f"<html><head><title>Wyniki {page}</title></head><body><div class='results'>{''.join(cards)}</div></body></html>"
+
+def pkt_listing_html(page=1, count=25, seed=0, site_url=None, first_id=None):
+    """Builds a PKT.pl search results page (site_url and first_id as in panorama_listing_html)."""
+    first_id = page * 100 if first_id is None else first_id
+    items = []
+    for site_id in range(first_id, first_id + count):
+        business = listing_business(site_id, seed)
+        website = site_url(site_id) if site_url else f"https://firma{site_id}.com.pl"
+        items.append(f"""
+<li class="list-items">
+  <div class="box">
+    <h2 class="company-name"><a href="https://www.pkt.pl/firma/{site_id}">{business['name']}</a></h2>
+    <address class="rest-address">{business['street']}, Kraków</address>
+    <a class="icon-telephone" href="tel:{business['phone'].replace(' ', '')}">{business['phone']}</a>
+    <a class="company-url" href="{website}">strona www</a>
+    <p>{business['description']}</p>
+  </div>
+</li>""")
+    return f"<html><body><ul class='list'>{''.join(items)}</ul></body></html>"
+
+def company_homepage_html(site_id=1, size_kb=300, seed=0):
+    """Builds a large company homepage with navigation, scripts and a few emails."""
+    rng = random.Random(seed * 1000 + site_id)
+    parts = [f"<html><head><title>Firma {site_id}</title>"]
+    parts.append("<script>" + "var x=1;" * 200 + f"var c='kontakt{site_id}@firma{site_id}.pl';</script></head><body>")
+    parts.append("<nav>" + ''.join(f'<a href="/oferta/{i}">Oferta {i}</a>' for i in range(30)))
+    parts.append(f'<a href="/kontakt">Kontakt</a><a href="/o-nas">O nas</a></nav>')
+    target = size_kb * 1024
+    size = sum(len(part) for part in parts)
+    block = 0
+    while size < target:
+        block += 1
+        chunk = (f"<section id='s{block}'><h2>{business_name(rng)}</h2>"
+                 f"<p>{' '.join(rng.choice(WORDS) for _ in range(80))}</p>"
+                 f"<ul>{''.join(f'<li><a href=/produkt/{block}-{i}>Produkt {i}</a></li>' for i in range(5))}</ul></section>")
+        parts.append(chunk)
+        size += len(chunk)
+    parts.append(f"<footer>Biuro: biuro{site_id}@firma{site_id}.pl <span data-email='info{site_id}@firma{site_id}.pl'></span></footer>")
+    parts.append("</body></html>")
+    return ''.join(parts)
+
+def load_fixtures(directory=None):
+    """Returns {'panorama': [...], 'pkt': [...], 'site': [...]} HTML strings."""
+    fixtures = {'panorama': [], 'pkt': [], 'site': []}
+    if directory and os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            kind = filename.split('_', 1)[0]
+            if kind in fixtures and filename.endswith('.html'):
+                with open(os.path.join(directory, filename), encoding='utf-8', errors='replace') as f:
+                    fixtures[kind].append(f.read())
+    if not fixtures['panorama']:
+        fixtures['panorama'] = [panorama_listing_html(page) for page in range(1, 4)]
+    if not fixtures['pkt']:
+        fixtures['pkt'] = [pkt_listing_html(page) for page in range(1, 4)]
+    if not fixtures['site']:
+        fixtures['site'] = [company_homepage_html(site_id) for site_id in range(1, 4)]
+    return fixtures
+
+def _page(body, links=()):
+    """Wraps a page body with a navigation bar of links."""
+    nav = ''.join(f'<a href="{href}">{text}</a>' for href, text in links)
+    return f"<html><head><title>Firma</title></head><body><nav>{nav}</nav>{body}</body></html>"
+
+def _offer_links(count=8):
+    return [(f"/oferta/{i}", f"Oferta {i}") for i in range(count)]
+
+def contact_site(site_id):
+    """Builds one small business site as {path: html} plus the emails it publishes.
+
+    Sites cycle through layouts seen in practice: emails on the homepage and
+    the contact page, only on a relative kontakt.html, only on an "about"
+    page, in nested directories, behind decoy links, or nowhere at all.
+    """
+    info, office, shop = f"info{site_id}@firma{site_id}.pl", f"biuro{site_id}@firma{site_id}.pl", f"sklep{site_id}@firma{site_id}.pl"
+    layout = site_id % 6
+    if layout == 0: # Generic email on the homepage, the office one on the contact page
+        pages = {
+            '/': _page(f"<footer>{info}</footer>", _offer_links() + [('o-nas', 'O nas'), ('kontakt', 'Kontakt')]),
+            '/kontakt': _page(f"<p>Biuro: <a href='mailto:{office}'>{office}</a>, {info}</p>"),
+            '/o-nas': _page("<p>Jesteśmy na rynku od 1998 roku.</p>", [('kontakt', 'Kontakt')]),
+        }
+        emails = [info, office]
+    elif layout == 1: # Only a relative contact page
+        pages = {
+            '/': _page("<p>Zapraszamy!</p>", [('oferta.html', 'Oferta'), ('galeria.html', 'Galeria'),
+                                              ('cennik.html', 'Cennik'), ('kontakt.html', 'Kontakt')]),
+            '/kontakt.html': _page(f"<p>Napisz: {office}</p>"),
+            '/oferta.html': _page("<p>Strzyżenie, koloryzacja.</p>"),
+        }
+        emails = [office]
+    elif layout == 2: # Email on the "about" page only; the contact page is a form
+        pages = {
+            '/': _page("<p>Witamy</p>", _offer_links() + [('https://facebook.com/kontakt', 'Facebook'),
+                                                           ('o-nas/', 'O nas'), ('kontakt/', 'Kontakt')]),
+            '/o-nas/': _page(f"<p>Właściciel: Anna, {office}</p>", [('../kontakt/', 'Kontakt')]),
+            '/kontakt/': _page("<form><input name='message'></form>"),
+        }
+        emails = [office]
+    elif layout == 3: # Language versions in subdirectories
+        pages = {
+            '/': _page("<p>Witamy</p>", _offer_links() + [('pl/kontakt/', 'Kontakt'), ('en/contact/', 'Contact')]),
+            '/pl/kontakt/': _page(f"<span data-email='{office}'></span><p>{info}</p>"),
+            '/en/contact/': _page(f"<p>{info}</p>"),
+        }
+        emails = [office, info]
+    elif layout == 4: # Decoy links next to the real contact page
+        pages = {
+            '/': _page(f"<p>Sklep: <a href='mailto:{shop}'>napisz</a></p>", [
+                ('blog/2019/05/kontakt-z-klientem', 'Blog'), ('kontakt#formularz', 'Formularz'),
+                ('kontakt?lang=en', 'EN'), ('files/kontakt.pdf', 'PDF'), ('javascript:void(0)', 'Menu'),
+                ('tel:123456789', 'Zadzwoń'), ('kontakt', 'Kontakt')]),
+            '/kontakt': _page(f"<p>{office}</p>"),
+            '/blog/2019/05/kontakt-z-klientem': _page("<p>Jak rozmawiać z klientem.</p>"),
+        }
+        emails = [shop, office]
+    else: # No emails anywhere
+        pages = {
+            '/': _page("<p>Zadzwoń do nas</p>", _offer_links() + [('o-nas', 'O nas'), ('kontakt', 'Kontakt'),
+                                                                   ('zespol', 'Zespół'), ('about', 'About')]),
+            '/kontakt': _page("<p>tel. 12 345 67 89</p>"),
+            '/o-nas': _page("<p>Historia firmy</p>"),
+            '/zespol': _page("<p>Nasz zespół</p>"),
+            '/about': _page("<p>About us</p>"),
+        }
+        emails = []
+    return pages, emails
+
+def load_contact_sites(directory=None, count=60):
+    """Returns [(pages, emails)] for the crawler benchmark.
+
+    A fixture directory holds one subdirectory per saved site with the pages
+    under their URL paths (index.html for "/") and the expected emails in
+    emails.txt, one per line. Without one, synthetic sites are used.
+    """
+    if not directory or not os.path.isdir(directory):
+        return [contact_site(site_id) for site_id in range(count)]
+    sites = []
+    for name in sorted(os.listdir(directory)):
+        root = os.path.join(directory, name)
+        if not os.path.isdir(root):
+            continue
+        pages, emails = {}, []
+        for folder, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(folder, filename)
+                if filename == 'emails.txt' and folder == root:
+                    with open(path, encoding='utf-8') as f:
+                        emails = [line.strip() for line in f if line.strip()]
+                    continue
+                url_path = '/' + os.path.relpath(path, root).replace(os.sep, '/')
+                if url_path.endswith('index.html'):
+                    url_path = url_path[:-len('index.html')]
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    pages[url_path] = f.read()
+        sites.append((pages, emails))
+    return sites
+
+def _cfemail(address, key):
+    """Encodes an address the way Cloudflare email protection does."""
+    return '%02x' % key + ''.join('%02x' % (ord(char) ^ key) for char in address)
+
+def _entities(text):
+    return ''.join(f'&#{ord(char)};' for char in text)
+
+# How addresses are written on real pages; each takes the address and a random generator
+EMAIL_FORMS = (
+    ('plain', lambda address, rng: f"<p>Email: {address}</p>"),
+    ('mailto', lambda address, rng: f'<a href="mailto:{address}?subject=Zapytanie">Napisz</a>'),
+    ('mailto-entities', lambda address, rng: f'<a href="{_entities("mailto:" + address)}">{_entities(address)}</a>'),
+    ('at-dot', lambda address, rng: "<p>{} [at] {} (dot) {}</p>".format(
+        address.split('@')[0], *address.split('@')[1].rsplit('.', 1))),
+    ('at-only', lambda address, rng: "<p>{}(at){}</p>".format(*address.split('@'))),
+    ('data-cfemail', lambda address, rng: f'<a href="/cdn-cgi/l/email-protection" class="__cf_email__" '
+                                          f'data-cfemail="{_cfemail(address, rng.randint(1, 255))}">[email&#160;protected]</a>'),
+    ('cf-href', lambda address, rng: f'<a href="/cdn-cgi/l/email-protection#{_cfemail(address, rng.randint(1, 255))}">Email</a>'),
+    ('json', lambda address, rng: '<script>var d={"html":"\\u003ca\\u003e' + address + '\\u003c/a\\u003e"};</script>'),
+    ('data-email', lambda address, rng: f"<span data-email='{address}'></span>"),
+)
+
+# Strings that look like addresses but are not the business's
+EMAIL_DECOYS = (
+    '<img src="/img/logo@2x.png" srcset="/img/hero@3x.webp 3x">',
+    '<script src="https://browser.sentry-cdn.com/x.js"></script><script>dsn="https://abc123@o45.ingest.sentry.io/1"</script>',
+    '<p>Przykład: jan.kowalski@example.com</p>',
+    '<input placeholder="twoj@email.com">',
+    '<script>var w="user@sentry-next.wixpress.com";</script>',
+)
+
+def email_page(page_id, size_kb=100, seed=0):
+    """Builds a page with addresses written in several forms. Returns (html, expected_emails)."""
+    rng = random.Random(seed * 1000 + page_id)
+    expected = []
+    blocks = []
+    for i, (name, form) in enumerate(rng.sample(EMAIL_FORMS, 3)):
+        address = f"{rng.choice(['biuro', 'info', 'kontakt', 'recepcja'])}{page_id}.{i}@firma{page_id}.{rng.choice(['pl', 'com.pl', 'eu'])}"
+        expected.append(address)
+        blocks.append(form(address, rng))
+    blocks.extend(rng.sample(EMAIL_DECOYS, 2))
+    filler = company_homepage_html(page_id, size_kb=size_kb, seed=seed)
+    # The filler homepage has its own plain addresses; they count as expected too
+    expected.extend([f"kontakt{page_id}@firma{page_id}.pl", f"biuro{page_id}@firma{page_id}.pl",
+                     f"info{page_id}@firma{page_id}.pl"])
+    middle = len(filler) // 2
+    return filler[:middle] + ''.join(blocks) + filler[middle:], expected
+
+def load_email_corpus(directory=None, count=20, size_kb=100):
+    """Returns [(html, expected_emails)] for the email extraction benchmark.
+
+    A fixture directory holds email_*.html pages, each with the expected
+    addresses in a email_*.txt file next to it, one per line.
+    """
+    corpus = []
+    if directory and os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if not (filename.startswith('email_') and filename.endswith('.html')):
+                continue
+            path = os.path.join(directory, filename)
+            with open(path, encoding='utf-8', errors='replace') as f:
+                markup = f.read()
+            expected = []
+            if os.path.exists(path[:-5] + '.txt'):
+                with open(path[:-5] + '.txt', encoding='utf-8') as f:
+                    expected = [line.strip().lower() for line in f if line.strip()]
+            corpus.append((markup, expected))
+    return corpus or [email_page(page_id, size_kb) for page_id in range(count)]
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.fixtures import listing_business, panorama_listing_html, pkt_listing_html
+
+# Local stand-in for the remote sites the scraper talks to.
+# Sites are spread over loopback addresses (127.0.0.1, 127.0.0.2, ...) so that
+# per-host limits behave like they do against real business websites.
+# The same server also answers like Panorama Firm (/szukaj?k=...&o=N), PKT.pl
+# (/szukaj/<query>/<N>) and the Places API textsearch, nearbysearch and details endpoints.
+PLACES_TEXTSEARCH_PATH = '/maps/api/place/textsearch/json'
+PLACES_NEARBY_PATH = '/maps/api/place/nearbysearch/json'
+PLACE_DETAILS_PATH = '/maps/api/place/details/json'
+EMPTY_LISTING = "<html><body><p>Brak wyników</p></body></html>"
+
+def site_email(site_id):
+    """Returns the email published on the homepage of a synthetic site."""
+    return f"info{site_id}@firma{site_id}.pl"
+
+def contact_email(site_id):
+    """Returns the email published on the contact page of a synthetic site."""
+    return f"biuro{site_id}@firma{site_id}.pl"
+
+def homepage_html(site_id):
+    """Builds the homepage of a synthetic business website."""
+    return f"""<html><head><title>Firma {site_id}</title></head>
+<body>
+<h1>Firma {site_id}</h1>
+<p>Napisz do nas: {site_email(site_id)}</p>
+<a href="/site/{site_id}/kontakt">Kontakt</a>
+<a href="/site/{site_id}/oferta">Oferta</a>
+<script>var tracking = "noreply@sentry.io";</script>
+</body></html>"""
+
+def contact_html(site_id):
+    """Builds the contact page of a synthetic business website."""
+    return f"""<html><body>
+<h1>Kontakt</h1>
+<p>Biuro: <a href="mailto:{contact_email(site_id)}">{contact_email(site_id)}</a></p>
+<span data-email="{site_email(site_id)}"></span>
+</body></html>"""
+
+class Stream:
+    """A fixture page body sent in chunks, with a pause between them and no Content-Length."""
+
+    def __init__(self, chunk, count, interval=0.0, content_type='text/html; charset=utf-8'):
+        self.chunk = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+        self.count = count
+        self.interval = interval
+        self.content_type = content_type
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Serves synthetic pages with the latency configured on the server."""
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output clean
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8'):
+        data = body.encode('utf-8')
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, stream):
+        self.send_response(200)
+        self.send_header('Content-Type', stream.content_type)
+        self.end_headers()
+        try:
+            for _ in range(stream.count):
+                self.wfile.write(stream.chunk)
+                if stream.interval:
+                    self.wfile.flush()
+                    time.sleep(stream.interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The client stopped reading
+
+    def _send_refusal(self, status):
+        self.send_response(status)
+        self.send_header('Retry-After', str(self.server.retry_after))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        server.count_request()
+        host = (self.headers.get('Host') or '').split(':')[0]
+        if not server.allow(host):
+            return self._send_refusal(503 if host in server.failing_hosts else 429)
+        if server.latency:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+        if server.error_rate and random.random() < server.error_rate:
+            server.count_error()
+            return self._send(500, "<html><body>Internal server error</body></html>")
+
+        url = urlsplit(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if url.path == '/szukaj':
+            return self._send(200, server.listing_page('panorama', int(params.get('o', 1))))
+        if url.path.startswith('/szukaj/'):
+            return self._send(200, server.listing_page('pkt', int(url.path.rsplit('/', 1)[-1] or 1)))
+        if url.path in (PLACES_TEXTSEARCH_PATH, PLACES_NEARBY_PATH):
+            return self._send(200, json.dumps(server.places_search(params, nearby=url.path == PLACES_NEARBY_PATH)),
+                              'application/json; charset=utf-8')
+        if url.path == PLACE_DETAILS_PATH:
+            return self._send(200, json.dumps(server.place_details(params)), 'application/json; charset=utf-8')
+
+        if server.pages is not None:
+            # Fixture sites: one site per host, pages by path
+            body = server.pages.get(host, {}).get(self.path.split('?')[0])
+            if body is None:
+                return self._send(404, "<html><body>Not found</body></html>")
+            if isinstance(body, Stream):
+                return self._send_stream(body)
+            return self._send(200, body)
+
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        if len(parts) >= 2 and parts[0] == 'site' and parts[1].isdigit():
+            site_id = int(parts[1])
+            page = parts[2] if len(parts) > 2 else ''
+            if page == '':
+                return self._send(200, homepage_html(site_id))
+            if page == 'kontakt':
+                return self._send(200, contact_html(site_id))
+            return self._send(200, f"<html><body>Oferta firmy {site_id}</body></html>")
+        self._send(404, "<html><body>Not found</body></html>")
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded HTTP server running in the background for benchmarks.
+
+    With throttle_rate, each host answers 429 with a Retry-After header once
+    it gets more than throttle_rate requests per second. Hosts in
+    failing_hosts always answer 503. With pages ({host: {path: html}}), the
+    server serves those fixture sites instead of the synthetic ones; a page
+    given as a Stream is sent in chunks (large, slow or non-HTML bodies).
+    A random error_rate fraction of requests gets a 500 response.
+
+    Directory searches return listing_pages pages of listing_size businesses
+    (or the recorded pages in listings, {'panorama': [html], 'pkt': [html]}).
+    Places searches return places_pages pages of places_size results, and a
+    next_page_token is refused until token_delay seconds after it was issued,
+    as the real API does. With places_density (places per square km), a
+    nearby search finds as many places as fit its circle, up to the
+    places_pages cap, so sharded searches can be measured; a text search
+    treats location and radius as a bias and returns the same places anyway.
+    Websites of listed businesses point at synthetic sites on this server;
+    overlap is the share of businesses found by more than one source.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, hosts=1, throttle_rate=None, retry_after=1,
+                 failing_hosts=(), pages=None, error_rate=0.0, listing_pages=3, listing_size=25, listings=None,
+                 places_pages=3, places_size=20, token_delay=2.0, overlap=0.5, places_density=None):
+        # Bind to all local addresses so 127.0.0.N host names reach the server
+        super().__init__(('', port), MockHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.hosts = max(1, min(hosts, 254))
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.failing_hosts = set(failing_hosts)
+        self.pages = pages
+        self.error_rate = error_rate
+        self.listing_pages = listing_pages
+        self.listing_size = listing_size
+        self.listings = listings or {}
+        self.places_pages = places_pages
+        self.places_size = places_size
+        self.token_delay = token_delay
+        self.overlap = overlap
+        self.places_density = places_density
+        self.requests = 0
+        self.refused = 0
+        self.errors = 0
+        self._tokens = {} # next_page_token -> (page, issued at, first site id, places found)
+        self._buckets = {} # host -> (tokens, last update)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def first_site_id(self, source, page, size):
+        """Numbers the businesses of a results page; other sources overlap the Panorama Firm ones."""
+        shift = 0 if source == 'panorama' else round(size * (1 - self.overlap))
+        if source == 'google':
+            shift *= 2
+        return page * 1000 + shift
+
+    def listing_page(self, source, page):
+        """Returns a Panorama Firm or PKT.pl results page, empty past the last one."""
+        recorded = self.listings.get(source)
+        if recorded:
+            return recorded[page - 1] if 1 <= page <= len(recorded) else EMPTY_LISTING
+        if not 1 <= page <= self.listing_pages:
+            return EMPTY_LISTING
+        build = panorama_listing_html if source == 'panorama' else pkt_listing_html
+        return build(page, self.listing_size, site_url=self.site_url,
+                     first_id=self.first_site_id(source, page, self.listing_size))
+
+    def places_search(self, params, nearby=False):
+        """Answers a Places textsearch or nearbysearch request (first page or pagetoken)."""
+        token = params.get('pagetoken')
+        if token:
+            with self._lock:
+                page, issued, first_id, total = self._tokens.get(token, (None, 0.0, 0, 0))
+            if page is None or time.monotonic() - issued < self.token_delay:
+                return {'status': 'INVALID_REQUEST', 'results': []}
+        else:
+            page = 1
+            first_id, total = self.first_site_id('google', 1, self.places_size), self.places_pages * self.places_size
+            if nearby and self.places_density and params.get('location') and params.get('radius'):
+                # Places in the searched circle, numbered by where the circle is
+                lat, lng = (float(value) for value in params['location'].split(','))
+                radius_km = float(params['radius']) / 1000
+                total = int(self.places_density * math.pi * radius_km ** 2)
+                first_id = 10 ** 6 + (round(lat * 1000) * 7919 + round(lng * 1000)) % 10 ** 6 * 1000
+        start = (page - 1) * self.places_size
+        count = min(self.places_size, total - start)
+        if page > self.places_pages or count <= 0:
+            return {'status': 'ZERO_RESULTS', 'results': []}
+        results = [{'place_id': f"place-{site_id}", 'name': listing_business(site_id)['name']}
+                   for site_id in range(first_id + start, first_id + start + count)]
+        data = {'status': 'OK', 'results': results}
+        if page < self.places_pages and start + count < total:
+            token = f"token-{page + 1}-{random.getrandbits(48):012x}"
+            with self._lock:
+                self._tokens[token] = (page + 1, time.monotonic(), first_id, total)
+            data['next_page_token'] = token
+        return data
+
+    def place_details(self, params):
+        """Answers a Places details request for a place_id from places_search."""
+        place_id = params.get('place_id', '')
+        if not place_id.startswith('place-') or not place_id[6:].isdigit():
+            return {'status': 'INVALID_REQUEST'}
+        site_id = int(place_id[6:])
+        business = listing_business(site_id)
+        return {'status': 'OK', 'result': {
+            'place_id': place_id,
+            'name': business['name'],
+            'formatted_address': f"{business['street']}, {business['postcode']} Kraków, Polska",
+            'formatted_phone_number': business['phone'],
+            'website': self.site_url(site_id),
+        }}
+
+    def allow(self, host):
+        """Token bucket per host; returns False (and counts a refusal) when the host is over its rate."""
+        with self._lock:
+            if host in self.failing_hosts:
+                self.refused += 1
+                return False
+            if not self.throttle_rate:
+                return True
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(host, (self.throttle_rate, now))
+            tokens = min(self.throttle_rate, tokens + (now - updated) * self.throttle_rate)
+            if tokens < 1:
+                self._buckets[host] = (tokens, now)
+                self.refused += 1
+                return False
+            self._buckets[host] = (tokens - 1, now)
+            return True
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def site_url(self, site_id):
+        """Returns the homepage URL of a synthetic site, spread over loopback hosts."""
+        host = f"127.0.0.{site_id % self.hosts + 1}"
+        return f"http://{host}:{self.port}/site/{site_id}/"
+
+    def base_url(self):
+        """Returns the URL the directory and Places API stand-ins are reached at.
+
+        Its host name is not one of the site hosts, so the PKT.pl parser's
+        internal-link check against PKT_URL does not drop websites on 127.0.0.1.
+        """
+        return f"http://localhost:{self.port}"
+
+    def host_url(self, index):
+        """Returns the root URL of the index-th loopback host (127.0.0.1, 127.0.0.2, ...)."""
+        return f"http://127.0.0.{index % 254 + 1}:{self.port}/"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
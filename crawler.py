@@ -0,0 +1,236 @@
+import heapq
+import threading
+import time
+from urllib.parse import urldefrag, urljoin, urlparse
+
+# Per-site limits of the contact-page crawler
+MAX_PAGES_PER_SITE = 4                # Homepage included
+MAX_BYTES_PER_SITE = 2 * 1024 * 1024  # HTML downloaded from one site, all pages together
+MAX_PAGE_BYTES = 512 * 1024          # Bytes read from one page; the rest of a longer page is not downloaded
+SITE_DEADLINE = 30.0                 # Seconds for a whole site; the socket timeout only bounds a single read
+MIN_LINK_SCORE = 1                    # Links scoring lower are never fetched
+CONTACT_LINK_SCORE = 8                # Links this likely to be a contact page (see FOLLOW_CONTACT_PAGE)
+FOLLOW_CONTACT_PAGE = False           # After emails were found, still fetch the best contact page (one more request)
+
+# Words in a link's path and how likely the page is to list contact emails
+LINK_KEYWORDS = (
+    ('kontakt', 10), ('contact', 10), ('impressum', 8), ('napisz', 6), ('dane-firmy', 6),
+    ('o-nas', 5), ('onas', 5), ('o-firmie', 5), ('about', 5), ('biuro', 3), ('zespol', 3),
+    ('team', 3), ('firma', 2),
+)
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.zip', '.rar',
+                      '.doc', '.docx', '.xls', '.xlsx', '.mp3', '.mp4', '.css', '.js', '.xml', '.json')
+NON_PAGE_SCHEMES = ('mailto:', 'tel:', 'javascript:', 'sms:', 'callto:', 'whatsapp:', 'data:')
+SLOWEST_SITES = 5                    # Sites listed by name in the run statistics
+
+def site_host(url):
+    """Returns the host of a URL without www, used to keep the crawl on one site."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith('www.') else host
+
+def score_link(url):
+    """Scores how likely a page is to list contact emails; 0 means it is not worth fetching."""
+    parsed = urlparse(url)
+    path = parsed.path.lower()
+    if path.endswith(SKIPPED_EXTENSIONS):
+        return 0
+    query = parsed.query.lower()
+    score = 0
+    for keyword, weight in LINK_KEYWORDS:
+        if keyword in path:
+            score = max(score, weight)
+        elif keyword in query:
+            score = max(score, weight // 2)
+    if score:
+        # Prefer /kontakt over /blog/2019/05/kontakt-z-klientem
+        depth = len([part for part in path.split('/') if part])
+        score = max(score - max(depth - 2, 0), MIN_LINK_SCORE)
+    return score
+
+class CrawlResult:
+    """Emails found on one site and what it cost to find them."""
+
+    def __init__(self):
+        self.emails = []
+        self.pages = 0
+        self.bytes = 0
+        self.urls = []
+        self.contact_url = None # The most contact-like page emails were found on
+        self.seconds = 0.0
+        self.truncated = 0     # Pages cut off at the byte cap or the deadline
+        self.skipped = 0       # Non-HTML responses, not downloaded
+        self.timed_out = False # The site deadline ended the crawl
+        self.failed = False
+
+class SiteStats:
+    """Bytes and time spent per crawled site over a run."""
+
+    def __init__(self):
+        self.sites = 0
+        self.pages = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.truncated = 0
+        self.skipped = 0
+        self.bytes = []   # Per site
+        self.seconds = [] # Per site
+        self.slowest = [] # Heap of (seconds, url), at most SLOWEST_SITES
+        self._lock = threading.Lock()
+
+    def record(self, url, result):
+        with self._lock:
+            self.sites += 1
+            self.pages += result.pages
+            self.failed += result.failed
+            self.timed_out += result.timed_out
+            self.truncated += result.truncated
+            self.skipped += result.skipped
+            self.bytes.append(result.bytes)
+            self.seconds.append(result.seconds)
+            if len(self.slowest) < SLOWEST_SITES:
+                heapq.heappush(self.slowest, (result.seconds, url))
+            elif result.seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (result.seconds, url))
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'sites': self.sites, 'pages': self.pages, 'failed': self.failed, 'timed_out': self.timed_out,
+                'truncated': self.truncated, 'skipped': self.skipped, 'bytes': sum(self.bytes),
+                'bytes_p50': percentile(self.bytes, 0.5), 'bytes_p95': percentile(self.bytes, 0.95),
+                'seconds_p50': round(percentile(self.seconds, 0.5), 3),
+                'seconds_p95': round(percentile(self.seconds, 0.95), 3),
+                'seconds_max': round(max(self.seconds, default=0.0), 3),
+                'slowest': [{'url': url, 'seconds': round(seconds, 3)}
+                            for seconds, url in sorted(self.slowest, reverse=True)],
+            }
+
+_site_stats = SiteStats()
+
+def site_stats():
+    """Returns the statistics of the sites crawled so far."""
+    return _site_stats
+
+def reset_site_stats():
+    """Starts the site statistics over (e.g. between benchmark runs)."""
+    global _site_stats
+    _site_stats = SiteStats()
+
+def percentile(values, fraction):
+    """Returns the value below which the given fraction of values fall (nearest rank)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def print_site_stats():
+    """Prints pages, bytes and time per crawled website."""
+    stats = _site_stats
+    if not stats.sites:
+        return
+    print("\n=== Website statistics ===")
+    print(f"sites: {stats.sites}  pages: {stats.pages}  failed: {stats.failed}  "
+          f"stopped at deadline: {stats.timed_out}  pages cut short: {stats.truncated}  "
+          f"non-HTML skipped: {stats.skipped}")
+    print(f"{'per site':<10} {'p50':>9} {'p95':>9} {'max':>9} {'total':>10}")
+    kib = [size / 1024 for size in stats.bytes]
+    print(f"{'KiB':<10} {percentile(kib, 0.5):9.1f} {percentile(kib, 0.95):9.1f} {max(kib):9.1f} {sum(kib):10.1f}")
+    print(f"{'seconds':<10} {percentile(stats.seconds, 0.5):9.2f} {percentile(stats.seconds, 0.95):9.2f} "
+          f"{max(stats.seconds):9.2f} {sum(stats.seconds):10.1f}")
+    slowest = ', '.join(f"{url} ({seconds:.1f} s)" for seconds, url in sorted(stats.slowest, reverse=True))
+    print(f"Slowest sites: {slowest}")
+
+def crawl_site(start_url, fetch_page, scan_page, max_pages=MAX_PAGES_PER_SITE, max_bytes=MAX_BYTES_PER_SITE,
+               max_page_bytes=MAX_PAGE_BYTES, max_seconds=SITE_DEADLINE, contact_url=None,
+               follow_contact=None):
+    """Crawls a site for emails, most promising pages first.
+
+    fetch_page(url, max_bytes, deadline) reads at most max_bytes of a page
+    until the deadline (a time.monotonic() value) and returns (final_url,
+    markup, size_in_bytes, complete); markup is None for non-HTML content.
+    It raises on errors. scan_page(markup) returns (emails, hrefs). Links are
+    resolved against the page's final URL and only same-site pages are
+    followed. The crawl ends at the first page that yields emails; with
+    follow_contact (default FOLLOW_CONTACT_PAGE) the best contact page is
+    still fetched after that if none was fetched yet. A contact_url
+    known from an earlier crawl is fetched before the homepage. Errors on the
+    homepage propagate; errors on other pages are printed and skipped.
+    Every crawl is counted in the site statistics (see print_site_stats).
+    """
+    result = CrawlResult()
+    started = time.monotonic()
+    if follow_contact is None:
+        follow_contact = FOLLOW_CONTACT_PAGE
+    try:
+        return _crawl(result, start_url, fetch_page, scan_page, max_pages, max_bytes, max_page_bytes,
+                      started + max_seconds, contact_url, follow_contact)
+    except BaseException:
+        result.failed = True
+        raise
+    finally:
+        result.seconds = time.monotonic() - started
+        _site_stats.record(start_url, result)
+
+def _crawl(result, start_url, fetch_page, scan_page, max_pages, max_bytes, max_page_bytes, deadline,
+           contact_url=None, follow_contact=False):
+    found = {}
+    frontier = [(0, 0, start_url)] # (-score, discovery order, url): ties keep page order
+    seen = {urldefrag(start_url)[0]}
+    if contact_url and urldefrag(contact_url)[0] not in seen and site_host(contact_url) == site_host(start_url):
+        seen.add(urldefrag(contact_url)[0])
+        heapq.heappush(frontier, (-CONTACT_LINK_SCORE, 1, contact_url))
+    contact_crawled = False
+    contact_score = -1
+
+    while frontier and result.pages < max_pages and result.bytes < max_bytes:
+        if time.monotonic() >= deadline:
+            result.timed_out = True
+            break
+        negative_score, _, url = heapq.heappop(frontier)
+        score = -negative_score
+        if found and (not follow_contact or contact_crawled or score < CONTACT_LINK_SCORE):
+            break
+
+        try:
+            final_url, markup, size, complete = fetch_page(url, min(max_page_bytes, max_bytes - result.bytes),
+                                                           deadline)
+        except Exception as e:
+            if url == start_url and not result.pages:
+                raise
+            print(f"Could not fetch page {url}: {e}")
+            continue
+        if markup is None:
+            result.skipped += 1
+            continue
+        result.pages += 1
+        result.bytes += size
+        result.urls.append(url)
+        if not complete:
+            result.truncated += 1
+            if time.monotonic() >= deadline:
+                result.timed_out = True
+        if score >= CONTACT_LINK_SCORE:
+            contact_crawled = True
+
+        emails, hrefs = scan_page(markup)
+        for email in emails:
+            found.setdefault(email, None)
+        if emails and score > contact_score:
+            result.contact_url, contact_score = final_url, score
+
+        seen.add(urldefrag(final_url)[0]) # After a redirect
+        host = site_host(final_url)
+        for href in hrefs:
+            href = href.strip()
+            if not href or href.lower().startswith(NON_PAGE_SCHEMES):
+                continue
+            link = urldefrag(urljoin(final_url, href))[0]
+            if link in seen or not link.startswith(('http://', 'https://')) or site_host(link) != host:
+                continue
+            seen.add(link)
+            link_score = score_link(link)
+            if link_score >= MIN_LINK_SCORE:
+                heapq.heappush(frontier, (-link_score, len(seen), link))
+
+    result.emails = list(found)
+    return result
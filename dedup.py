@@ -0,0 +1,266 @@
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# Records are compared only with records sharing a blocking key (phone, website
+# domain, street address, name token). Blocks that grow past this size are
+# too generic to be useful and stop collecting candidates, which keeps the
+# number of comparisons per record bounded.
+MAX_BLOCK_SIZE = 50
+NAME_SIMILARITY = 0.85        # Fuzzy name match needed when only the name and address agree
+WEAK_NAME_SIMILARITY = 0.5    # Name match needed when the phone or website domain agrees
+
+# Fields copied from a duplicate into the kept record when the kept one is missing them
+MERGE_FIELDS = ('name', 'formatted_address', 'formatted_phone_number', 'website')
+
+# Characters NFKD does not decompose into an ASCII base letter
+_TRANSLITERATION = str.maketrans({'ł': 'l', 'Ł': 'L', 'ß': 'ss', '–': ' ', '—': ' '})
+
+# Legal forms removed from names ("Anna sp. z o.o." == "Anna")
+_LEGAL_SUFFIXES = re.compile(
+    r'\b(sp\s*z\s*o\s*o|spolka z ograniczona odpowiedzialnoscia|sp\s*k|sp\s*j|sp\s*p|s\s*a|s\s*c|'
+    r'spolka (akcyjna|cywilna|jawna|komandytowa|partnerska)|spolka|ltd|gmbh|inc)\b'
+)
+# Street prefixes removed from addresses ("ul. Długa 5" == "Długa 5")
+_STREET_PREFIXES = re.compile(r'^(ul|ulica|al|aleja|aleje|os|osiedle|pl|plac|rondo|rynek glowny)\b\s*')
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_POSTCODE_FIRST = re.compile(r'^\d{2} \d{3}\b')
+
+COUNTRY_NAMES = {'polska', 'poland'}
+
+# Hosts shared by many unrelated businesses; their domain says nothing about identity
+GENERIC_HOSTS = {
+    'facebook.com', 'instagram.com', 'booksy.com', 'google.com', 'sites.google.com', 'wix.com',
+    'wixsite.com', 'linktr.ee', 'panoramafirm.pl', 'pkt.pl', 'youtube.com', 'allegro.pl', 'olx.pl',
+}
+
+def strip_diacritics(text):
+    """Lowercases text and replaces Polish (and other) diacritics with ASCII letters."""
+    text = unicodedata.normalize('NFKD', text.translate(_TRANSLITERATION))
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+def normalize_name(name):
+    """Returns the sorted, de-duplicated name tokens without legal forms or punctuation."""
+    text = _NON_ALNUM.sub(' ', strip_diacritics(name or ''))
+    text = _LEGAL_SUFFIXES.sub(' ', text)
+    return tuple(sorted(set(text.split())))
+
+def normalize_street(address):
+    """Returns the street part of an address ("dluga 5"), or "" if there is none."""
+    first_part = strip_diacritics((address or '').split(',')[0])
+    text = _NON_ALNUM.sub(' ', first_part).strip()
+    text = _STREET_PREFIXES.sub('', text)
+    # A part made only of a postcode and a city is not a street
+    if _POSTCODE_FIRST.match(text) or not re.search(r'[a-z]', text) or not re.search(r'\d', text):
+        return ""
+    return text.strip()
+
+def normalize_city(address):
+    """Returns the city of an address ("krakow" for "Długa 5, 31-147 Kraków, Polska"), or ""."""
+    parts = [part for part in (address or '').split(',')[1:] if part.strip()]
+    for part in reversed(parts):
+        city = _NON_ALNUM.sub(' ', strip_diacritics(part))
+        city = re.sub(r'\d+', ' ', city).split()
+        if city and ' '.join(city) not in COUNTRY_NAMES:
+            return ' '.join(city)
+    return ""
+
+def normalize_phone(phone):
+    """Returns the last 9 digits of a phone number (drops +48 / 0048 prefixes)."""
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-9:] if len(digits) >= 7 else ""
+
+def website_domain(website):
+    """Returns the website's host without www, or "" for missing and generic hosts."""
+    if not website:
+        return ""
+    if not website.startswith(('http://', 'https://')):
+        website = 'https://' + website
+    host = (urlparse(website).hostname or "").lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host in GENERIC_HOSTS or any(host.endswith('.' + generic) for generic in GENERIC_HOSTS):
+        return ""
+    return host
+
+def record_key(result):
+    """Returns the exact deduplication key of a record, or None if it has no name."""
+    name = result.get('name', '').strip().lower() # Add strip() for consistency
+    if not name:
+        return None
+    address_parts = result.get('formatted_address', '').lower().split(',')
+    # Use first part of address (street) and name for a more robust key
+    simple_address = address_parts[0].strip() if address_parts else ""
+    return f"{name}|{simple_address}"
+
+def _within_edits(token_a, token_b, edits):
+    """Returns True if two words are at most `edits` insertions, deletions or substitutions apart."""
+    # Common prefixes and suffixes never need an edit
+    start = 0
+    while start < len(token_a) and start < len(token_b) and token_a[start] == token_b[start]:
+        start += 1
+    token_a, token_b = token_a[start:], token_b[start:]
+    while token_a and token_b and token_a[-1] == token_b[-1]:
+        token_a, token_b = token_a[:-1], token_b[:-1]
+    if not token_a or not token_b:
+        return max(len(token_a), len(token_b)) <= edits
+    if edits == 0:
+        return False
+    return (_within_edits(token_a[1:], token_b[1:], edits - 1)
+            or _within_edits(token_a[1:], token_b, edits - 1)
+            or _within_edits(token_a, token_b[1:], edits - 1))
+
+@lru_cache(maxsize=65536)
+def _similar_tokens(token_a, token_b):
+    """Returns True if two name words differ only by a typo (one edit, two for long words)."""
+    shorter = min(len(token_a), len(token_b))
+    if shorter < 4: # Short words and numbers must match exactly
+        return False
+    edits = 2 if shorter >= 9 else 1
+    return abs(len(token_a) - len(token_b)) <= edits and _within_edits(token_a, token_b, edits)
+
+def name_similarity(tokens_a, tokens_b):
+    """Token overlap of two normalized names, insensitive to word order.
+
+    Tokens that differ only slightly ("fryzjerski" / "fryzierski") count as shared.
+    """
+    if not tokens_a or not tokens_b:
+        return 0.0
+    set_a, set_b = set(tokens_a), set(tokens_b)
+    matched = len(set_a & set_b)
+    rest_b = list(set_b - set_a)
+    for token_a in set_a - set_b:
+        for token_b in rest_b:
+            if _similar_tokens(token_a, token_b):
+                matched += 1
+                rest_b.remove(token_b)
+                break
+    return matched / (len(set_a) + len(set_b) - matched)
+
+class _Entry:
+    """Normalized identity of a kept record."""
+    __slots__ = ('key', 'name', 'street', 'city', 'phone', 'domain', 'record')
+
+    def __init__(self, key, name, street, city, phone, domain, record):
+        self.key = key
+        self.name = name
+        self.street = street
+        self.city = city
+        self.phone = phone
+        self.domain = domain
+        self.record = record
+
+def _merge_into(target, other):
+    """Copies fields missing from target and adds new emails from a duplicate record."""
+    for field in MERGE_FIELDS:
+        if not target.get(field) and other.get(field):
+            target[field] = other[field]
+    emails = target.setdefault('emails', [])
+    for email in other.get('emails') or []:
+        if email not in emails:
+            emails.append(email)
+
+class Deduplicator:
+    """Incremental entity resolution over records from all sources.
+
+    add() normalizes the record, looks up candidates that share a blocking key
+    and compares it with them using fuzzy name matching. Duplicates are merged
+    into the record that was kept first. Only normalized keys are retained for
+    records that were release()d, so memory stays small in streaming runs.
+    """
+
+    def __init__(self, max_block_size=MAX_BLOCK_SIZE):
+        self.max_block_size = max_block_size
+        self.merged = 0
+        self._exact = {}
+        self._blocks = defaultdict(list)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _blocking_keys(self, entry):
+        keys = []
+        if entry.phone:
+            keys.append('p:' + entry.phone)
+        if entry.domain:
+            keys.append('d:' + entry.domain)
+        if entry.street:
+            keys.append(f"a:{entry.street}|{entry.city}")
+        keys.extend('n:' + token for token in entry.name if len(token) >= 3)
+        return keys
+
+    def _is_match(self, entry, candidate):
+        if entry.phone and entry.phone == candidate.phone:
+            return name_similarity(entry.name, candidate.name) >= WEAK_NAME_SIMILARITY
+        if entry.domain and entry.domain == candidate.domain:
+            # Branches of a chain share the website, but not the phone number or the street
+            if entry.phone and candidate.phone and entry.phone != candidate.phone:
+                return False
+            if entry.street and candidate.street and entry.street != candidate.street:
+                return False
+            return name_similarity(entry.name, candidate.name) >= WEAK_NAME_SIMILARITY
+        # Different addresses mean different branches, unless the phone agreed above
+        if entry.street and candidate.street and entry.street != candidate.street:
+            return False
+        if entry.city and candidate.city and entry.city != candidate.city:
+            return False
+        return name_similarity(entry.name, candidate.name) >= NAME_SIMILARITY
+
+    def _find_match(self, entry, keys):
+        seen = set()
+        for key in keys:
+            block = self._blocks.get(key)
+            if not block or len(block) > self.max_block_size:
+                continue
+            for candidate in block:
+                if id(candidate) in seen:
+                    continue
+                seen.add(id(candidate))
+                if self._is_match(entry, candidate):
+                    return candidate
+        return None
+
+    def add(self, result):
+        """Returns True if the record is new (and keeps it), False if it was a duplicate.
+
+        Fields of a duplicate are merged into the kept record while that record
+        has not been released yet.
+        """
+        key = record_key(result)
+        if key is None:
+            return False
+        with self._lock:
+            existing = self._exact.get(key)
+            if existing is None:
+                address = result.get('formatted_address', '')
+                entry = _Entry(key, normalize_name(result.get('name', '')),
+                               normalize_street(address), normalize_city(address),
+                               normalize_phone(result.get('formatted_phone_number', '')),
+                               website_domain(result.get('website', '')), result)
+                keys = self._blocking_keys(entry)
+                existing = self._find_match(entry, keys)
+            if existing is not None:
+                self.merged += 1
+                if existing.record is not None:
+                    _merge_into(existing.record, result)
+                return False
+
+            self._exact[key] = entry
+            self._entries[id(result)] = entry
+            for block_key in keys:
+                block = self._blocks[block_key]
+                if len(block) <= self.max_block_size:
+                    block.append(entry)
+            return True
+
+    def release(self, result):
+        """Forgets the kept record object (its keys stay), e.g. once it has been written out."""
+        with self._lock:
+            entry = self._entries.pop(id(result), None)
+            if entry is not None:
+                entry.record = None
+
+    def __len__(self):
+        return len(self._exact)
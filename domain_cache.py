@@ -0,0 +1,300 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from enrichment import host_key
+from http_client import CircuitOpenError
+
+# On-disk results of website crawls per domain, shared by all records, jobs
+# and runs: a domain is crawled at most once per TTL, whichever lead links to it.
+DOMAIN_CACHE_ENABLED = True
+DOMAIN_CACHE_PATH = os.path.join('.cache', 'domains.sqlite')
+
+# How long the outcome of a crawl is reused before the domain is crawled again (seconds)
+DOMAIN_TTLS = {
+    'emails': 30 * 24 * 3600,     # Emails found
+    'no_emails': 7 * 24 * 3600,   # Crawled, nothing found
+    'not_html': 30 * 24 * 3600,   # The homepage is a PDF, an image, ...
+    'dns': 7 * 24 * 3600,         # The domain does not resolve
+    'tls': 3 * 24 * 3600,         # Certificate or handshake errors
+    'gone': 7 * 24 * 3600,        # 404/410 on the homepage
+    'http': 24 * 3600,            # Other error statuses
+    'timeout': 12 * 3600,         # Connect/read timeouts, or nothing found before the site deadline
+    'connection': 12 * 3600,      # Refused or reset connections and other network errors
+}
+FAILURE_STATUSES = {'dns', 'tls', 'gone', 'http', 'timeout', 'connection'}
+MAX_NEGATIVE_TTL = 60 * 24 * 3600 # Failure TTLs double with every failure in a row, up to this
+
+# Hosts that are not the business's own website: social profiles, booking
+# platforms, link pages and directories. Never crawled; subdomains included.
+NON_CRAWLABLE_HOSTS = {
+    'facebook.com', 'fb.com', 'fb.me', 'instagram.com', 'tiktok.com', 'youtube.com', 'youtu.be', 'twitter.com',
+    'x.com', 'linkedin.com', 'pinterest.com', 'linktr.ee', 'wa.me', 'booksy.com', 'moment.pl', 'versum.com',
+    'znanylekarz.pl', 'docplanner.com', 'google.com', 'goo.gl', 'g.page', 'olx.pl', 'allegro.pl',
+    'panoramafirm.pl', 'pkt.pl', 'aleo.com', 'oferteo.pl', 'fixly.pl',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    emails TEXT NOT NULL DEFAULT '[]',
+    contact_url TEXT,
+    error TEXT,
+    failures INTEGER NOT NULL DEFAULT 0,
+    checked_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+def is_non_crawlable(domain):
+    """Returns True if the domain or one of its parent domains is in NON_CRAWLABLE_HOSTS."""
+    while domain:
+        if domain in NON_CRAWLABLE_HOSTS:
+            return True
+        domain = domain.partition('.')[2]
+    return False
+
+def classify_error(error):
+    """Returns the failure status stored for a crawl error, or None if it says nothing about the site."""
+    if isinstance(error, CircuitOpenError):
+        return None # The breaker is about this run, the host may be fine tomorrow
+    if isinstance(error, requests.exceptions.SSLError):
+        return 'tls'
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return 'gone' if status in (404, 410) else 'http'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        text = str(error)
+        if any(marker in text for marker in ('NameResolutionError', 'Failed to resolve', 'Name or service not known',
+                                             'getaddrinfo failed', 'nodename nor servname')):
+            return 'dns'
+        return 'connection'
+    if isinstance(error, requests.exceptions.InvalidURL):
+        return 'dns'
+    return None
+
+def crawl_status(result):
+    """Returns the status stored for a finished crawl (a crawler.CrawlResult)."""
+    if result.emails:
+        return 'emails'
+    if not result.pages and result.skipped:
+        return 'not_html'
+    if result.timed_out:
+        return 'timeout'
+    return 'no_emails'
+
+class DomainEntry:
+    """The stored outcome of the last crawl of a domain."""
+
+    def __init__(self, domain, status, emails, contact_url, error, failures, checked_at, expires_at):
+        self.domain = domain
+        self.status = status
+        self.emails = emails
+        self.contact_url = contact_url
+        self.error = error
+        self.failures = failures
+        self.checked_at = checked_at
+        self.expires_at = expires_at
+
+    def is_fresh(self):
+        return time.time() < self.expires_at
+
+    @property
+    def failed(self):
+        return self.status in FAILURE_STATUSES
+
+class DomainStats:
+    """What the domain cache saved over a run."""
+
+    def __init__(self):
+        self.crawled = 0
+        self.reused = 0          # Fresh entries with emails or a finished crawl
+        self.failures_reused = 0 # Fresh failure entries: the site was not tried again
+        self.failures_stored = 0
+        self.skipped_hosts = 0   # NON_CRAWLABLE_HOSTS
+
+    def as_dict(self):
+        return dict(vars(self))
+
+class DomainCache:
+    """SQLite store of crawl outcomes per domain, with negative TTLs for failures."""
+
+    def __init__(self, path=DOMAIN_CACHE_PATH, ttls=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttls = dict(DOMAIN_TTLS if ttls is None else ttls)
+        self._lock = threading.Lock()
+        self._domain_locks = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def domain_lock(self, domain):
+        """Returns a lock held while a domain is crawled, so records sharing it wait for one crawl."""
+        with self._lock:
+            lock = self._domain_locks.get(domain)
+            if lock is None:
+                lock = self._domain_locks[domain] = threading.Lock()
+            return lock
+
+    def lookup(self, domain):
+        """Returns the stored entry for a domain (fresh or not), or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, emails, contact_url, error, failures, checked_at, expires_at FROM domains "
+                "WHERE domain = ?", (domain,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, emails, contact_url, error, failures, checked_at, expires_at = row
+        return DomainEntry(domain, status, json.loads(emails), contact_url, error, failures, checked_at, expires_at)
+
+    def store_crawl(self, domain, result):
+        """Stores the outcome of a crawl that finished (a crawler.CrawlResult)."""
+        status = crawl_status(result)
+        if status in FAILURE_STATUSES:
+            return self.store_failure(domain, status, "No emails found before the site deadline")
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO domains VALUES (?, ?, ?, ?, NULL, 0, ?, ?)",
+                (domain, status, json.dumps(result.emails), result.contact_url, now, now + self.ttls[status]),
+            )
+            self._db.commit()
+
+    def store_failure(self, domain, status, error):
+        """Stores a failed crawl. The TTL doubles with every failure in a row; a known contact URL is kept."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT failures, contact_url, status FROM domains WHERE domain = ?",
+                                   (domain,)).fetchone()
+            failures, contact_url = 1, None
+            if row:
+                contact_url = row[1]
+                if row[2] in FAILURE_STATUSES:
+                    failures = row[0] + 1
+            ttl = min(self.ttls[status] * 2 ** (failures - 1), MAX_NEGATIVE_TTL)
+            self._db.execute(
+                "INSERT OR REPLACE INTO domains VALUES (?, ?, '[]', ?, ?, ?, ?, ?)",
+                (domain, status, contact_url, error[:500], failures, now, now + ttl),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM domains")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+_stats = DomainStats()
+_stats_lock = threading.Lock()
+
+def get_domain_cache():
+    """Returns the shared domain cache, or None when it is disabled."""
+    global _cache
+    if not DOMAIN_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DomainCache(DOMAIN_CACHE_PATH)
+    return _cache
+
+def configure_domain_cache(enabled=None, path=None, ttls=None):
+    """Changes domain cache settings. Takes effect for the next get_domain_cache() call."""
+    global DOMAIN_CACHE_ENABLED, DOMAIN_CACHE_PATH, _cache
+    if enabled is not None:
+        DOMAIN_CACHE_ENABLED = enabled
+    if path is not None:
+        DOMAIN_CACHE_PATH = path
+    if ttls:
+        DOMAIN_TTLS.update(ttls)
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+def _count(name):
+    with _stats_lock:
+        setattr(_stats, name, getattr(_stats, name) + 1)
+
+def crawl_domain(url, crawl):
+    """Returns (emails, crawl result) for a website, crawling its domain at most once per TTL.
+
+    crawl(url, contact_url) crawls the site and returns a crawler.CrawlResult;
+    contact_url is where emails were found last time, or None. Its errors
+    are stored as failures with a negative TTL and re-raised. The result is
+    None when the domain was skipped or served from the cache. emails is None
+    when the crawl failed (a timeout, or a failure cached earlier), so callers
+    can tell a failed crawl from a site without emails.
+    """
+    domain = host_key(url)
+    if is_non_crawlable(domain):
+        _count('skipped_hosts')
+        print(f"Skipping {url}: not a business website")
+        return [], None
+    cache = get_domain_cache()
+    if cache is None:
+        _count('crawled')
+        result = crawl(url, None)
+        return (None if crawl_status(result) in FAILURE_STATUSES else result.emails), result
+
+    with cache.domain_lock(domain):
+        entry = cache.lookup(domain)
+        if entry is not None and entry.is_fresh():
+            if entry.failed:
+                _count('failures_reused')
+                print(f"Skipping {url}: {entry.status} failure {entry.failures}x, retried after "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.expires_at))}")
+                return None, None
+            else:
+                _count('reused')
+                print(f"Reusing {len(entry.emails)} emails of {domain} from the domain cache")
+            return list(entry.emails), None
+        _count('crawled')
+        try:
+            result = crawl(url, entry.contact_url if entry else None)
+        except Exception as e:
+            status = classify_error(e)
+            if status:
+                cache.store_failure(domain, status, str(e))
+                _count('failures_stored')
+            raise
+        cache.store_crawl(domain, result)
+        if crawl_status(result) in FAILURE_STATUSES:
+            _count('failures_stored')
+            return None, result
+        return result.emails, result
+
+def domain_stats():
+    """Returns the domain cache counters of the run."""
+    with _stats_lock:
+        return _stats.as_dict()
+
+def reset_domain_stats():
+    """Starts the domain cache counters over (e.g. between benchmark runs)."""
+    global _stats
+    with _stats_lock:
+        _stats = DomainStats()
+
+def print_domain_stats():
+    """Prints how many website crawls the domain cache saved."""
+    stats = domain_stats()
+    if not any(stats.values()):
+        return
+    print("\n=== Domain cache ===")
+    print(f"crawled: {stats['crawled']}  reused: {stats['reused']}  failures reused: {stats['failures_reused']}  "
+          f"failures stored: {stats['failures_stored']}  skipped hosts: {stats['skipped_hosts']}")
@@ -0,0 +1,144 @@
+import html
+import re
+from urllib.parse import unquote
+
+# Domains whose addresses are placeholders or belong to embedded services, not the business.
+# Subdomains are blocked too (o123.ingest.sentry.io).
+BLOCKED_DOMAINS = {
+    'example.com', 'example.pl', 'example.org', 'domain.com', 'domena.pl', 'yourmail.com', 'email.com',
+    'wixpress.com', 'sentry.io', 'sentry-next.wixpress.com', 'mysite.com', 'twojadomena.pl', 'test.com',
+}
+
+# Endings of file names that the pattern catches as addresses ("logo@2x.png",
+# "bundle@3.1.min.js"). Any other ending of 2-24 letters is taken as a TLD.
+FILE_EXTENSIONS = {
+    'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'avif', 'ico', 'bmp', 'tif', 'tiff', 'heic', 'css', 'scss',
+    'js', 'mjs', 'ts', 'map', 'json', 'xml', 'html', 'htm', 'php', 'asp', 'aspx', 'jsp', 'txt', 'pdf', 'doc',
+    'docx', 'xls', 'xlsx', 'zip', 'rar', 'gz', 'mp3', 'mp4', 'webm', 'mov', 'woff', 'woff2', 'ttf', 'otf', 'eot',
+}
+
+# One scan over the page finds every place an address or link can start:
+#   @, %40, &#64; / &#x40;  an address, plain or with HTML entities / URL escapes
+#   [at] (at) {at} [małpa]  an obfuscated address, "biuro [at] firma (dot) pl"
+#   href=                   a link; mailto: links are covered by the address cases
+#   data-cfemail=, /cdn-cgi/l/email-protection#   a Cloudflare-protected address
+# The pattern starts with a character class so the regex engine can skip
+# quickly to candidate characters; the look-behinds then confirm the marker.
+# The address around a marker is read with small anchored patterns.
+_ENTITY = r'&\#(?:\d{2,3}|x[0-9a-fA-F]{2});'
+_DOT_WORD = r'\s*[\[\(\{]\s*(?:dot|DOT|kropka)\s*[\]\)\}]\s*'
+_TRIGGER = re.compile(
+    r'[@%&\[\(\{hHd/]'
+    r'(?:(?<=@)|(?<=%)40|(?<=&)\#0*64;|(?<=&)\#x0*40;'
+    r'|(?<=[\[\(\{])\s*(?:at|AT|ma[lł]pa)\s*[\]\)\}]\s*'
+    r'|(?<=h)ref\s*=|(?<=H)REF\s*='
+    r'|(?<=d)ata-cfemail|(?<=/)cdn-cgi/l/email-protection\#)'
+)
+_DOMAIN_AFTER = re.compile(
+    r'(?:[A-Za-z0-9-]|' + _ENTITY + r')+(?:(?:\.|&\#0*46;|&\#x0*2e;)(?:[A-Za-z0-9-]|' + _ENTITY + r')+)+')
+_OBFUSCATED_DOMAIN_AFTER = re.compile(r'[A-Za-z0-9-]+(?:(?:' + _DOT_WORD + r'|\.)[A-Za-z0-9-]+)+')
+_OBFUSCATED_DOT = re.compile(_DOT_WORD)
+_HREF_VALUE = re.compile(r'\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+_CF_VALUE = re.compile(r'(?:\s*=\s*["\']?)?([0-9a-fA-F]{8,})')
+# Characters walked back over from a marker to find the start of the local part
+# (entity characters included, they are decoded afterwards)
+_LOCAL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-&#;')
+_MAX_LOCAL_LENGTH = 200 # Encoded with entities, a 64 character local part can be this long
+# Text glued to the front of an address: characters that cannot be in it, or a JSON escape (">info@...")
+_LEADING_JUNK = re.compile(r'^(?:.*[^a-z0-9._%+-])?(?:u00[0-9a-f]{2})*')
+_VALID_EMAIL = re.compile(r'^[a-z0-9](?:[a-z0-9._%+-]{0,62}[a-z0-9_+-])?@(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24}$')
+
+def decode_cfemail(encoded):
+    """Decodes a Cloudflare email-protection string (hex, XOR-ed with its first byte)."""
+    try:
+        key = int(encoded[:2], 16)
+        data = bytes(int(encoded[i:i + 2], 16) ^ key for i in range(2, len(encoded) - 1, 2))
+        return data.decode('utf-8')
+    except ValueError:
+        return ""
+
+def is_blocked(domain):
+    """Returns True if the domain or one of its parent domains is blocked."""
+    while True:
+        if domain in BLOCKED_DOMAINS:
+            return True
+        dot = domain.find('.')
+        if dot < 0:
+            return False
+        domain = domain[dot + 1:]
+
+def normalize_email(candidate):
+    """Returns the lowercased address if it is a valid, non-blocked email, else ""."""
+    local, _, domain = candidate.strip().lower().rpartition('@')
+    if not local:
+        return ""
+    local = _LEADING_JUNK.sub('', local).lstrip('.')
+    domain = domain.rstrip('.')
+    email = f"{local}@{domain}"
+    if not _VALID_EMAIL.match(email):
+        return ""
+    if domain.rsplit('.', 1)[-1] in FILE_EXTENSIONS or is_blocked(domain):
+        return ""
+    return email
+
+def _local_start(markup, position, skip_spaces=False):
+    """Returns where the local part ending at position starts."""
+    if skip_spaces:
+        while position > 0 and markup[position - 1] == ' ':
+            position -= 1
+    start = position
+    floor = max(position - _MAX_LOCAL_LENGTH, 0)
+    while start > floor and markup[start - 1] in _LOCAL_CHARS:
+        start -= 1
+    return start
+
+def scan_html(markup):
+    """Returns (emails, hrefs) found in raw HTML in one pass over the text.
+
+    Emails are lowercased, de-duplicated in order of appearance, checked for
+    a file-name ending and filtered through BLOCKED_DOMAINS. hrefs are HTML-unescaped.
+    """
+    emails = {}
+    hrefs = []
+    for match in _TRIGGER.finditer(markup):
+        marker = markup[match.start()]
+        if marker in 'hH':
+            if match.start() and markup[match.start() - 1].isalnum(): # "xhref=" is not a link
+                continue
+            value = _HREF_VALUE.match(markup, match.end())
+            if value:
+                href = value.group(1) or value.group(2) or value.group(3) or ''
+                # mailto: and Cloudflare links are read by the address markers inside them
+                if href and not href.startswith(('mailto:', 'MAILTO:', '/cdn-cgi/l/email-protection')):
+                    hrefs.append(html.unescape(href))
+            continue
+        if marker in 'd/':
+            encoded = _CF_VALUE.match(markup, match.end())
+            if not encoded:
+                continue
+            email = normalize_email(decode_cfemail(encoded.group(1)))
+        elif marker in '@%&':
+            domain = _DOMAIN_AFTER.match(markup, match.end())
+            if not domain:
+                continue
+            start = _local_start(markup, match.start())
+            candidate = markup[start:domain.end()]
+            if '&' in candidate:
+                candidate = html.unescape(candidate)
+            if '%' in candidate:
+                candidate = unquote(candidate)
+            email = normalize_email(candidate)
+        else:
+            domain = _OBFUSCATED_DOMAIN_AFTER.match(markup, match.end())
+            if not domain:
+                continue
+            start = _local_start(markup, match.start(), skip_spaces=True)
+            local = markup[start:match.start()].rstrip()
+            email = normalize_email(local + '@' + _OBFUSCATED_DOT.sub('.', domain.group()))
+        if email:
+            emails.setdefault(email, None)
+    return list(emails), hrefs
+
+def extract_emails(markup):
+    """Returns the emails found in a page of HTML or plain text."""
+    return scan_html(markup)[0]
@@ -0,0 +1,108 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from metrics import record_sleep
+
+# Concurrency limits for the email enrichment stage
+MAX_CONCURRENCY = 16        # Websites crawled at the same time (whole run)
+PER_HOST_CONCURRENCY = 1    # Websites crawled at the same time on one host
+HOST_DELAY = (0.0, 0.5)     # Extra random delay between two crawls of the same host; the request
+                            # rate per host is paced by the adaptive limiter in http_client
+
+def host_key(url):
+    """Returns the host used to group politeness limits for a website URL."""
+    if not url:
+        return ""
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith('www.') else host
+
+def website_key(url):
+    """Returns the key under which crawl results for a website are shared."""
+    return (url or "").strip().rstrip('/').lower()
+
+class Enricher:
+    """Crawls websites for emails under a global and a per-host concurrency limit.
+
+    Must be created and used inside a running event loop. The blocking
+    fetch_emails function runs on a thread pool. With share_crawls, every
+    website is crawled once and later records with the same website (e.g.
+    from other jobs of a batch) reuse the result.
+    """
+
+    def __init__(self, fetch_emails, max_concurrency=MAX_CONCURRENCY,
+                 per_host_concurrency=PER_HOST_CONCURRENCY, host_delay=HOST_DELAY, share_crawls=False):
+        self.fetch_emails = fetch_emails
+        self.host_delay = host_delay
+        self.crawled = 0
+        self.failed = 0
+        self.shared_hits = 0
+        self._crawls = {} if share_crawls else None
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._global_sem = asyncio.Semaphore(max_concurrency)
+        self._host_sems = defaultdict(lambda: asyncio.Semaphore(per_host_concurrency))
+        self._next_allowed = defaultdict(float)
+
+    async def enrich(self, result):
+        """Fills result['emails'] for one record with a website.
+
+        Returns False if the website could not be crawled (fetch_emails raised
+        or returned None); the record's emails are left as they were then.
+        """
+        website = result.get('website')
+        if self._crawls is not None:
+            key = website_key(website)
+            crawl = self._crawls.get(key)
+            if crawl is not None:
+                self.shared_hits += 1
+                emails = await asyncio.shield(crawl)
+                if emails is None:
+                    result.setdefault('emails', [])
+                    return False
+                result['emails'] = list(emails)
+                return True
+            crawl = self._crawls[key] = asyncio.get_running_loop().create_future()
+            crawled = False
+            try:
+                crawled = await self._crawl(result)
+            finally:
+                crawl.set_result(tuple(result.get('emails') or ()) if crawled else None)
+            return crawled
+        return await self._crawl(result)
+
+    async def _crawl(self, result):
+        website = result.get('website')
+        host = host_key(website)
+        loop = asyncio.get_running_loop()
+
+        async with self._host_sems[host]:
+            # Wait out the politeness delay for this host only
+            wait = self._next_allowed[host] - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                record_sleep('politeness', wait)
+
+            async with self._global_sem:
+                try:
+                    emails = await loop.run_in_executor(self.executor, self.fetch_emails, website)
+                except Exception as e:
+                    print(f"Error fetching emails from {website}: {e}")
+                    emails = None
+
+            self._next_allowed[host] = time.monotonic() + random.uniform(*self.host_delay)
+
+        self.crawled += 1
+        if emails is None:
+            self.failed += 1
+            result.setdefault('emails', [])
+            return False
+        result['emails'] = emails
+        return True
+
+    def close(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,225 @@
+import csv
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+
+from metrics import stage
+
+# Output formats selectable with --format; the file extension is used when no format is given
+FORMATS = ('xlsx', 'csv', 'jsonl', 'parquet')
+
+# Headers with three separate columns for email addresses
+HEADERS = ['Name', 'Address', 'Phone', 'Website', 'Email 1', 'Email 2', 'Email 3', 'Other Emails']
+MAX_COLUMN_WIDTH = 60 # Limit max width slightly more
+PARQUET_BATCH_SIZE = 10000
+PARTIAL_SUFFIX = '.partial.jsonl' # Records are streamed here while a run is in progress
+
+def record_to_row(item):
+    """Flattens a record into the spreadsheet columns."""
+    # Get the list of emails
+    emails = item.get('emails') or []
+
+    # Prepare list of values to add to the row
+    row = [
+        item.get('name', ''),
+        item.get('formatted_address', ''),
+        item.get('formatted_phone_number', ''),
+        item.get('website', ''),
+    ]
+
+    # Add the first three emails in separate columns
+    for i in range(3):
+        row.append(emails[i] if i < len(emails) else '') # Empty column if no email
+
+    # Add remaining emails in the last column, comma-separated
+    row.append(', '.join(emails[3:]) if len(emails) > 3 else '')
+    return row
+
+class Sink(ABC):
+    """Base class of the output sinks: write() records one at a time, then close()."""
+
+    @abstractmethod
+    def write(self, result):
+        """Writes one record."""
+
+    @abstractmethod
+    def close(self):
+        """Finishes the file. Safe to call more than once."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TextFileSink(Sink):
+    """A sink writing one text file as records arrive.
+
+    With flush_each, every record is flushed to disk as it is written, so the
+    file survives an interrupted run.
+    """
+
+    def __init__(self, path, flush_each=False, encoding='utf-8', newline=None):
+        self.path = path
+        self.count = 0
+        self.flush_each = flush_each
+        self._file = open(path, 'w', encoding=encoding, newline=newline)
+
+    def write(self, result):
+        self._write(result)
+        if self.flush_each:
+            self._file.flush()
+        self.count += 1
+
+    @abstractmethod
+    def _write(self, result):
+        """Writes one record to self._file."""
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+class JsonlSink(TextFileSink):
+    """Writes records to a JSON Lines file."""
+
+    def _write(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+class CsvSink(TextFileSink):
+    """Writes the spreadsheet columns to a CSV file (UTF-8 with BOM so Excel opens it correctly)."""
+
+    def __init__(self, path, flush_each=False):
+        super().__init__(path, flush_each, encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(HEADERS)
+
+    def _write(self, result):
+        self._writer.writerow(record_to_row(result))
+
+class ExcelSink(Sink):
+    """Streams records into a write-only xlsx workbook.
+
+    Column widths are measured while records are written. Because the xlsx
+    format stores widths before the rows, rows are first spooled to a
+    compact temporary file and streamed into the workbook on close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._widths = [len(header) for header in HEADERS]
+        self._file = tempfile.TemporaryFile('w+', encoding='utf-8')
+
+    def write(self, result):
+        row = record_to_row(result)
+        for i, value in enumerate(row):
+            length = len(str(value))
+            if length > self._widths[i]:
+                self._widths[i] = length
+        self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        with stage('xlsx workbook'):
+            self._write_workbook()
+
+    def _write_workbook(self):
+        # openpyxl takes a tenth of a second to import; only xlsx output pays for it
+        import openpyxl
+        from openpyxl.utils import get_column_letter
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        # Adjust column widths
+        for i, width in enumerate(self._widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = min(width + 2, MAX_COLUMN_WIDTH)
+        ws.append(HEADERS)
+        self._file.seek(0)
+        for line in self._file:
+            ws.append(json.loads(line))
+        self._file.close()
+        wb.save(self.path)
+
+class ParquetSink(Sink):
+    """Writes records to a Parquet file in batches. Requires pyarrow."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.count = 0
+        self._pa = pa
+        self._schema = pa.schema([
+            ('name', pa.string()),
+            ('address', pa.string()),
+            ('phone', pa.string()),
+            ('website', pa.string()),
+            ('emails', pa.list_(pa.string())),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch = []
+
+    def write(self, result):
+        self._batch.append(result)
+        self.count += 1
+        if len(self._batch) >= PARQUET_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        columns = {
+            'name': [item.get('name', '') for item in self._batch],
+            'address': [item.get('formatted_address', '') for item in self._batch],
+            'phone': [item.get('formatted_phone_number', '') for item in self._batch],
+            'website': [item.get('website', '') for item in self._batch],
+            'emails': [list(item.get('emails') or []) for item in self._batch],
+        }
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+        self._batch = []
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        self._writer = None
+
+SINKS = {'xlsx': ExcelSink, 'csv': CsvSink, 'jsonl': JsonlSink, 'parquet': ParquetSink}
+
+def detect_format(path, fmt=None):
+    """Returns the output format given explicitly or by the file extension (xlsx by default)."""
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return extension if extension in SINKS else 'xlsx'
+
+def with_extension(path, fmt):
+    """Replaces the extension of a path with the one of an output format."""
+    return os.path.splitext(path)[0] + '.' + fmt
+
+def open_sink(path, fmt=None):
+    """Opens a sink for a path; the format comes from fmt or the file extension."""
+    return SINKS[detect_format(path, fmt)](path)
+
+def export(records, path, fmt=None):
+    """Writes records to a file in one pass. Returns the number written."""
+    with open_sink(path, fmt) as sink:
+        for record in records:
+            sink.write(record)
+    return sink.count
+
+def read_jsonl(path):
+    """Yields records from a JSON Lines file one at a time."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# On-disk cache for GET responses, shared by all sources.
+CACHE_ENABLED = True
+CACHE_PATH = os.path.join('.cache', 'http_cache.sqlite')
+CACHE_MAX_BYTES = 500 * 1024 * 1024 # Least recently used entries are evicted above this size
+
+# How long a response is served without asking the server again (seconds)
+CACHE_TTLS = {
+    'panorama': 24 * 3600,
+    'pkt': 24 * 3600,
+    'google': 24 * 3600,
+    'websites': 7 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+# Google answers errors like OVER_QUERY_LIMIT with HTTP 200, so check the JSON status too
+GOOGLE_CACHEABLE_STATUSES = {'OK', 'ZERO_RESULTS'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+def cache_key(method, url):
+    """Returns the cache key for a request. URLs are hashed so API keys are not stored."""
+    return hashlib.sha256(f"{method} {url}".encode('utf-8')).hexdigest()
+
+class CacheEntry:
+    """A stored response."""
+
+    def __init__(self, key, status, headers, body, etag, last_modified, stored_at):
+        self.key = key
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def is_fresh(self, ttl):
+        return time.time() - self.stored_at < ttl
+
+    def conditional_headers(self):
+        """Returns the headers used to revalidate this entry with the server."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self, request):
+        """Builds a requests.Response from the stored data."""
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK'
+        response.from_cache = True
+        return response
+
+class CacheStats:
+    """Hit/miss counters for one source."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stored = 0
+        self.evicted = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+class ResponseCache:
+    """SQLite-backed response cache with per-source TTLs and size-based LRU eviction."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttls=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl(self, source):
+        return self.ttls.get(source, DEFAULT_TTL)
+
+    def _stats_for(self, source):
+        stats = self.stats.get(source)
+        if stats is None:
+            stats = self.stats[source] = CacheStats()
+        return stats
+
+    def lookup(self, source, key):
+        """Returns the stored entry for a key, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self._stats_for(source).misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        status, headers, body, etag, last_modified, stored_at = row
+        return CacheEntry(key, status, json.loads(headers), body, etag, last_modified, stored_at)
+
+    def record_hit(self, source, revalidated=False):
+        with self._lock:
+            stats = self._stats_for(source)
+            stats.hits += 1
+            if revalidated:
+                stats.revalidated += 1
+
+    def record_miss(self, source):
+        with self._lock:
+            self._stats_for(source).misses += 1
+
+    def refresh(self, key):
+        """Marks an entry as fresh again after a 304 Not Modified answer."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._db.commit()
+
+    def store(self, source, key, response):
+        """Stores a response body and its validators."""
+        body = response.content
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')}
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source, response.status_code, json.dumps(headers), body,
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now, len(body)),
+            )
+            self._total_bytes += len(body)
+            self._stats_for(source).stored += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, source, size FROM responses ORDER BY accessed_at LIMIT 50"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, source, size in rows:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self._stats_for(source).evicted += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def is_cacheable(source, response):
+    """Decides whether a fetched response may be stored."""
+    if response.status_code != 200:
+        return False
+    if source == 'google':
+        # A next_page_token expires within minutes, so neither a page that hands one out nor a page
+        # fetched with one is stored: served later, it would send pagination off with a stale token
+        if 'pagetoken' in parse_qs(urlsplit(response.url or '').query):
+            return False
+        try:
+            data = response.json()
+        except ValueError:
+            return False
+        return data.get('status') in GOOGLE_CACHEABLE_STATUSES and not data.get('next_page_token')
+    return True
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the shared response cache, or None when caching is disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(CACHE_PATH, CACHE_MAX_BYTES)
+    return _cache
+
+def configure_cache(enabled=None, path=None, max_bytes=None, ttls=None):
+    """Changes cache settings. Takes effect for the next get_cache() call."""
+    global CACHE_ENABLED, CACHE_PATH, CACHE_MAX_BYTES, _cache
+    if enabled is not None:
+        CACHE_ENABLED = enabled
+    if path is not None:
+        CACHE_PATH = path
+    if max_bytes is not None:
+        CACHE_MAX_BYTES = max_bytes
+    if ttls:
+        CACHE_TTLS.update(ttls)
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+def cache_stats():
+    """Returns hit/miss counters per source."""
+    if _cache is None:
+        return {}
+    return {source: stats.as_dict() for source, stats in _cache.stats.items()}
+
+def print_cache_stats():
+    """Prints cache hits and misses per source."""
+    stats = cache_stats()
+    if not stats:
+        return
+    print("\n=== Cache statistics ===")
+    for source, counts in stats.items():
+        print(f"{source:<10} hits: {counts['hits']:5d}  misses: {counts['misses']:5d}  revalidated: {counts['revalidated']:5d}  evicted: {counts['evicted']:5d}")
@@ -0,0 +1,370 @@
+import email.utils
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from http_cache import get_cache, cache_key, is_cacheable
+from metrics import record_bytes, record_request, record_sleep, timed_sleep
+from rate_limit import AdaptiveRateLimiter, CircuitBreaker
+
+# Connection pool settings per source.
+# pool_connections: number of hosts whose pools are kept alive
+# pool_maxsize:     keep-alive connections kept per host
+# timeout:          default (connect, read) timeout when a call does not pass one
+POOL_SETTINGS = {
+    'panorama': {'pool_connections': 1, 'pool_maxsize': 4, 'timeout': 15},
+    'pkt': {'pool_connections': 1, 'pool_maxsize': 4, 'timeout': 15},
+    'google': {'pool_connections': 2, 'pool_maxsize': 16, 'timeout': (5, 15)},
+    'websites': {'pool_connections': 200, 'pool_maxsize': 2, 'timeout': 15},
+}
+
+# Adaptive request rate per host (requests per second): starting rate, floor and ceiling.
+# Every host of a source gets its own limiter and circuit breaker.
+THROTTLE_SETTINGS = {
+    'panorama': {'rate': 0.7, 'min_rate': 0.1, 'max_rate': 2.0, 'burst': 2},
+    'pkt': {'rate': 0.7, 'min_rate': 0.1, 'max_rate': 2.0, 'burst': 2},
+    'google': {'rate': 10.0, 'min_rate': 1.0, 'max_rate': 25.0, 'burst': 8},
+    'websites': {'rate': 1.0, 'min_rate': 0.2, 'max_rate': 4.0, 'burst': 2},
+}
+
+# Retries of GET/HEAD requests that failed with a connection error or one of these statuses
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}     # Statuses that also slow the host's limiter down
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5                 # Seconds; the retry delay is random up to BACKOFF_BASE * 2 ** attempt
+BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 120.0            # A longer Retry-After is not waited out; the response is returned
+BREAKER_FAILURES = 5               # Failures in a row that open a host's circuit
+BREAKER_RESET = 30.0               # Seconds before an open circuit lets a trial request through
+READ_CHUNK_SIZE = 16 * 1024       # Largest piece read at a time from a streamed body (see read_bounded)
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+_sessions = {}
+_stats = {}
+_throttles = {}
+_lock = threading.Lock()
+_local = threading.local() # Deadline of the requests this thread sends (see send_deadline)
+
+class HostThrottle:
+    """Adaptive rate limiter and circuit breaker for one host."""
+
+    def __init__(self, settings):
+        self.limiter = AdaptiveRateLimiter(settings['rate'], settings['min_rate'], settings['max_rate'],
+                                           burst=settings.get('burst', 1))
+        self.breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+
+def host_throttle(source, host):
+    """Returns the shared throttle of a host for a source."""
+    key = (source, host)
+    throttle = _throttles.get(key)
+    if throttle is None:
+        with _lock:
+            throttle = _throttles.get(key)
+            if throttle is None:
+                settings = THROTTLE_SETTINGS.get(source, THROTTLE_SETTINGS['websites'])
+                throttle = _throttles[key] = HostThrottle(settings)
+    return throttle
+
+def report_throttle(source, url, retry_after=None):
+    """Slows a host down after a throttling signal outside HTTP statuses (e.g. Google OVER_QUERY_LIMIT)."""
+    host_throttle(source, urlparse(url).hostname or '').limiter.on_throttle(retry_after)
+
+def parse_retry_after(value):
+    """Returns the seconds to wait from a Retry-After header (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+def backoff_delay(attempt):
+    """Jittered exponential backoff: a random delay up to BACKOFF_BASE * 2 ** attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+@contextmanager
+def send_deadline(deadline):
+    """Makes requests sent by this thread inside the block give up at deadline (a time.monotonic() value).
+
+    Each attempt's timeout is cut to the time left, and no retry is made
+    whose backoff would end after the deadline.
+    """
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+def _cut_timeout(timeout, seconds):
+    """Returns a (connect, read) timeout no longer than seconds."""
+    if isinstance(timeout, tuple):
+        return tuple(seconds if part is None else min(part, seconds) for part in timeout)
+    return seconds if timeout is None else min(timeout, seconds)
+
+class ConnectionStats:
+    """Counts requests and newly opened connections for one source."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_retry(self, throttled=False):
+        with self._lock:
+            self.retries += 1
+            if throttled:
+                self.throttled += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    @property
+    def reused(self):
+        """Requests served over an already open connection (handshakes saved)."""
+        return max(self.requests - self.connections, 0)
+
+    def as_dict(self):
+        return {'requests': self.requests, 'connections': self.connections, 'reused': self.reused,
+                'retries': self.retries, 'throttled': self.throttled}
+
+def _counting_pool(base, stats):
+    """Returns a subclass of a urllib3 pool class that counts new connections."""
+    class CountingPool(base):
+        def _new_conn(self):
+            stats.record_connection()
+            return super()._new_conn()
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with a default timeout, connection reuse counting, response caching
+    and per-host adaptive throttling with retries."""
+
+    def __init__(self, source, stats, timeout=None, **kwargs):
+        self.source = source
+        self.stats = stats
+        self.default_timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.stats),
+            'https': _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+    def _send_throttled(self, request, timeout, **kwargs):
+        """Sends a request under its host's limiter and circuit breaker, retrying transient failures."""
+        host = urlparse(request.url).hostname or ''
+        throttle = host_throttle(self.source, host)
+        retries = MAX_RETRIES if request.method in ('GET', 'HEAD') else 0
+        deadline = getattr(_local, 'deadline', None)
+        for attempt in range(retries + 1):
+            if not throttle.breaker.allow():
+                raise CircuitOpenError(f"Too many failures from {host}, not sending requests for now",
+                                       request=request)
+            record_sleep('rate limit', throttle.limiter.acquire())
+            attempt_timeout = timeout
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise requests.exceptions.Timeout(f"Deadline passed before {request.url} was sent",
+                                                      request=request)
+                attempt_timeout = _cut_timeout(timeout, left)
+            self.stats.record_request()
+            started = time.monotonic()
+            try:
+                response = super().send(request, timeout=attempt_timeout, **kwargs)
+                # Streamed bodies are counted as they are read (read_bounded)
+                size = 0 if kwargs.get('stream') else len(response.content)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                record_request(self.source, time.monotonic() - started, error=True)
+                throttle.breaker.record_failure()
+                delay = backoff_delay(attempt)
+                if attempt == retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    raise
+                self.stats.record_retry()
+                timed_sleep('retry backoff', delay)
+                continue
+            except Exception:
+                # Any other error (a broken chunked body, ...) still has to end a half-open trial,
+                # or the breaker would keep the host blocked for the rest of the run
+                record_request(self.source, time.monotonic() - started, error=True)
+                throttle.breaker.record_failure()
+                raise
+            latency = time.monotonic() - started
+            record_request(self.source, latency, size, error=response.status_code >= 400)
+
+            if response.status_code not in RETRY_STATUSES:
+                throttle.breaker.record_success()
+                throttle.limiter.on_success(latency)
+                return response
+
+            throttle.breaker.record_failure()
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            throttled = response.status_code in THROTTLE_STATUSES
+            if throttled:
+                throttle.limiter.on_throttle(min(retry_after or 0, MAX_RETRY_AFTER))
+            delay = backoff_delay(attempt)
+            if attempt == retries or (retry_after or 0) > MAX_RETRY_AFTER or \
+                    (deadline is not None and time.monotonic() + delay + (retry_after or 0) >= deadline):
+                return response
+            response.close()
+            self.stats.record_retry(throttled)
+            # The limiter already waits out Retry-After; the backoff spreads retries of parallel requests
+            timed_sleep('retry backoff', delay)
+        return response
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.default_timeout
+
+        cache = get_cache() if request.method == 'GET' else None
+        if cache is None:
+            return self._send_throttled(request, timeout, **kwargs)
+
+        key = cache_key(request.method, request.url)
+        entry = cache.lookup(self.source, key)
+        if entry and entry.is_fresh(cache.ttl(self.source)):
+            cache.record_hit(self.source)
+            return entry.to_response(request)
+        if entry:
+            # Stale: ask the server whether our copy is still valid
+            request.headers.update(entry.conditional_headers())
+
+        response = self._send_throttled(request, timeout, **kwargs)
+
+        if entry and response.status_code == 304:
+            response.close()
+            cache.refresh(key)
+            cache.record_hit(self.source, revalidated=True)
+            return entry.to_response(request)
+        if entry:
+            cache.record_miss(self.source)
+        if not kwargs.get('stream') and is_cacheable(self.source, response):
+            cache.store(self.source, key, response)
+        return response
+
+def read_bounded(response, max_bytes, deadline=None):
+    """Reads the body of a streamed response up to max_bytes or until the deadline (a time.monotonic() value).
+
+    Returns (content, complete). Data is read as it arrives, so a server
+    trickling an endless body stops at the deadline instead of holding the
+    worker. A complete body is kept on the response (see cache_response);
+    the caller closes the response.
+    """
+    if response.raw is None or response._content_consumed:
+        # Served from the cache, the body is already in memory
+        content = response.content
+        return content[:max_bytes], len(content) <= max_bytes
+
+    read = getattr(response.raw, 'read1', response.raw.read)
+    chunks = []
+    size = 0
+    complete = False
+    while size <= max_bytes:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        try:
+            # One byte past the cap tells a body of exactly max_bytes from a longer one
+            chunk = read(min(READ_CHUNK_SIZE, max_bytes + 1 - size), decode_content=True)
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            if not chunks:
+                raise requests.exceptions.ConnectionError(e, response=response)
+            break # Keep what arrived before the connection stalled or dropped
+        if not chunk:
+            complete = True
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+
+    record_bytes(getattr(response.connection, 'source', 'other'), size)
+    content = b''.join(chunks)
+    if size > max_bytes:
+        content = content[:max_bytes]
+        complete = False
+    if complete:
+        response._content = content
+        response._content_consumed = True
+    return content, complete
+
+def cache_response(source, response):
+    """Stores a streamed response whose whole body was read (the adapter only stores non-streamed ones)."""
+    cache = get_cache()
+    if (cache is None or getattr(response, 'from_cache', False) or not response._content_consumed
+            or response.request is None or response.request.method != 'GET'):
+        return
+    if is_cacheable(source, response):
+        cache.store(source, cache_key('GET', response.request.url), response)
+
+def _create_session(source):
+    """Creates a keep-alive session with its own connection pools for a source."""
+    settings = POOL_SETTINGS.get(source, POOL_SETTINGS['websites'])
+    stats = _stats.setdefault(source, ConnectionStats())
+    adapter = PooledAdapter(
+        source,
+        stats,
+        timeout=settings['timeout'],
+        pool_connections=settings['pool_connections'],
+        pool_maxsize=settings['pool_maxsize'],
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session(source):
+    """Returns the shared session for a source ('panorama', 'pkt', 'google', 'websites')."""
+    session = _sessions.get(source)
+    if session is None:
+        with _lock:
+            session = _sessions.get(source)
+            if session is None:
+                session = _sessions[source] = _create_session(source)
+    return session
+
+def connection_stats():
+    """Returns request/connection counts per source."""
+    return {source: stats.as_dict() for source, stats in _stats.items()}
+
+def print_connection_stats():
+    """Prints how many handshakes connection reuse saved per source."""
+    stats = connection_stats()
+    if not stats:
+        return
+    print("\n=== Connection statistics ===")
+    for source, counts in stats.items():
+        print(f"{source:<10} requests: {counts['requests']:5d}  new connections: {counts['connections']:5d}  "
+              f"reused: {counts['reused']:5d}  retries: {counts['retries']:4d}  throttled: {counts['throttled']:4d}")
+    open_circuits = [host for (source, host), throttle in _throttles.items() if throttle.breaker.opened]
+    if open_circuits:
+        print(f"Hosts cut off after repeated failures: {', '.join(sorted(set(open_circuits)))}")
+
+def close_sessions():
+    """Closes all shared sessions and their connection pools."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
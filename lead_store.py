@@ -0,0 +1,266 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from dedup import (name_similarity, normalize_city, normalize_name, normalize_phone, normalize_street, record_key,
+                   strip_diacritics, website_domain, WEAK_NAME_SIMILARITY)
+
+# Persistent store of every lead seen across runs
+LEAD_STORE_PATH = 'leads.sqlite'
+EMAIL_REFRESH_DAYS = 30 # Websites are crawled again once their emails are older than this
+
+# Record fields kept in the store, in the order used by the exporters
+LEAD_FIELDS = ('place_id', 'name', 'formatted_address', 'formatted_phone_number', 'website')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    place_id TEXT,
+    phone TEXT,
+    domain TEXT,
+    record_key TEXT,
+    name TEXT,
+    formatted_address TEXT,
+    formatted_phone_number TEXT,
+    website TEXT,
+    emails TEXT NOT NULL DEFAULT '[]',
+    emails_website TEXT,
+    content_hash TEXT,
+    first_seen_at REAL NOT NULL,
+    last_seen_at REAL NOT NULL,
+    changed_at REAL NOT NULL,
+    emails_refreshed_at REAL
+);
+CREATE INDEX IF NOT EXISTS leads_place_id ON leads (place_id);
+CREATE INDEX IF NOT EXISTS leads_phone ON leads (phone);
+CREATE INDEX IF NOT EXISTS leads_domain ON leads (domain);
+CREATE INDEX IF NOT EXISTS leads_record_key ON leads (record_key);
+CREATE INDEX IF NOT EXISTS leads_changed_at ON leads (changed_at);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    query TEXT,
+    location TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    new_leads INTEGER DEFAULT 0,
+    changed_leads INTEGER DEFAULT 0
+);
+"""
+
+def normalize_field(field, value):
+    """Returns the comparable form of a lead field, so source formatting differences are not changes.
+
+    "Długa 5, 31-147 Kraków, Polska" and "ul. Długa 5, Kraków" both become
+    ("dluga 5", "krakow"); phones keep their last 9 digits, websites their domain.
+    """
+    value = value or ''
+    if field == 'name':
+        return normalize_name(value)
+    if field == 'formatted_address':
+        street, city = normalize_street(value), normalize_city(value)
+        return (street, city) if street or city else (' '.join(strip_diacritics(value).split()), '')
+    if field == 'formatted_phone_number':
+        return normalize_phone(value) or value.strip()
+    if field == 'website':
+        return website_domain(value) or value.strip().rstrip('/').lower()
+    return value
+
+def same_value(field, stored, new):
+    """Returns True if new says the same as the stored value. Parts of an address new leaves out do not count."""
+    stored, new = normalize_field(field, stored), normalize_field(field, new)
+    if field == 'formatted_address':
+        return all(not part or part == stored_part for stored_part, part in zip(stored, new))
+    return stored == new
+
+def normalize_emails(emails):
+    return sorted({email.strip().lower() for email in emails or []})
+
+def content_hash(result):
+    """Hashes the normalized fields whose change makes a lead count as changed."""
+    data = [normalize_field(field, result.get(field)) for field in LEAD_FIELDS[1:]]
+    data.append(normalize_emails(result.get('emails')))
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _add_stored_emails(result, row):
+    """Adds the emails stored for a lead to a record."""
+    emails = result.setdefault('emails', [])
+    for email in json.loads(row['emails']):
+        if email not in emails:
+            emails.append(email)
+
+class LeadStore:
+    """SQLite store of leads keyed by a stable identity (place_id, phone or website domain).
+
+    Keeps when each lead was first seen, last changed and when its emails were
+    last refreshed, so re-runs only crawl websites that are new or stale.
+    """
+
+    def __init__(self, path=LEAD_STORE_PATH, email_refresh_days=EMAIL_REFRESH_DAYS):
+        self.path = path
+        self.email_max_age = email_refresh_days * 24 * 3600
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._refreshing = set() # id() of records whose emails are being refreshed this run
+        self._counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    def start_run(self, query, location):
+        """Records the start of a run and returns its id."""
+        with self._lock:
+            cursor = self._db.execute("INSERT INTO runs (query, location, started_at) VALUES (?, ?, ?)",
+                                      (query, location, time.time()))
+            self._db.commit()
+            return cursor.lastrowid
+
+    def finish_run(self, run_id, counts=None):
+        """Records the end of a run. counts defaults to the totals of this store instance."""
+        counts = counts or self._counts
+        with self._lock:
+            self._db.execute("UPDATE runs SET finished_at = ?, new_leads = ?, changed_leads = ? WHERE id = ?",
+                             (time.time(), counts.get('new', 0), counts.get('changed', 0), run_id))
+            self._db.commit()
+
+    def _find(self, result):
+        """Returns the stored lead for a record, matching place_id, then phone, then website domain."""
+        name = normalize_name(result.get('name', ''))
+        phone = normalize_phone(result.get('formatted_phone_number', ''))
+        lookups = (
+            ('place_id', result.get('place_id'), False),
+            ('phone', phone, False),
+            # Chains can share a domain, so the name and phone have to agree as well
+            ('domain', website_domain(result.get('website', '')), True),
+            ('record_key', record_key(result), False),
+        )
+        for column, value, check_name in lookups:
+            if not value:
+                continue
+            for row in self._db.execute(f"SELECT * FROM leads WHERE {column} = ?", (value,)):
+                if not check_name:
+                    return row
+                # Branches of a chain share the domain but not the phone number
+                if phone and row['phone'] and phone != row['phone']:
+                    continue
+                if name_similarity(name, normalize_name(row['name'] or '')) >= WEAK_NAME_SIMILARITY:
+                    return row
+        return None
+
+    def should_enrich(self, result):
+        """Returns True if the record's website must be crawled for emails.
+
+        For leads whose emails are still fresh, the stored emails are copied
+        into the record instead.
+        """
+        if not result.get('website'):
+            return False
+        with self._lock:
+            row = self._find(result)
+        fresh = (
+            row is not None
+            and row['emails_refreshed_at'] is not None
+            and time.time() - row['emails_refreshed_at'] < self.email_max_age
+            and row['emails_website'] == result.get('website')
+        )
+        if fresh:
+            _add_stored_emails(result, row)
+            return False
+        self._refreshing.add(id(result))
+        return True
+
+    def crawl_failed(self, result):
+        """Keeps the stored emails of a lead whose website could not be crawled; it is retried next run."""
+        self._refreshing.discard(id(result))
+        with self._lock:
+            row = self._find(result)
+        if row is not None:
+            _add_stored_emails(result, row)
+
+    def save(self, result):
+        """Inserts or updates the lead for a record. Returns 'new', 'changed' or 'unchanged'."""
+        now = time.time()
+        emails_refreshed = id(result) in self._refreshing
+        self._refreshing.discard(id(result))
+        values = {field: result.get(field) or '' for field in LEAD_FIELDS}
+        identity = {
+            'phone': normalize_phone(values['formatted_phone_number']),
+            'domain': website_domain(values['website']),
+            'record_key': record_key(result),
+        }
+
+        with self._lock:
+            row = self._find(result)
+            if row is None:
+                status = 'new'
+                self._db.execute(
+                    "INSERT INTO leads (place_id, phone, domain, record_key, name, formatted_address, "
+                    "formatted_phone_number, website, emails, emails_website, content_hash, first_seen_at, "
+                    "last_seen_at, changed_at, emails_refreshed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (values['place_id'] or None, identity['phone'] or None, identity['domain'] or None,
+                     identity['record_key'], values['name'], values['formatted_address'],
+                     values['formatted_phone_number'], values['website'], json.dumps(result.get('emails') or []),
+                     values['website'] if emails_refreshed else None, content_hash(result), now, now, now,
+                     now if emails_refreshed else None),
+                )
+            else:
+                # Keep the stored value of a field unless this record really changes it: sources
+                # (and runs) format the same address or phone differently, which is not a change
+                merged = dict(result)
+                for field in LEAD_FIELDS:
+                    if row[field] and (not merged.get(field) or same_value(field, row[field], merged[field])):
+                        merged[field] = row[field]
+                stored_emails = json.loads(row['emails'])
+                if (not emails_refreshed and not merged.get('emails')) or \
+                        normalize_emails(merged.get('emails')) == normalize_emails(stored_emails):
+                    merged['emails'] = stored_emails
+                # Only a field that really changed (or was filled in) changes the hash; place_id is not part of it
+                new_hash = content_hash(merged)
+                status = 'changed' if new_hash != row['content_hash'] else 'unchanged'
+                self._db.execute(
+                    "UPDATE leads SET place_id = ?, phone = ?, domain = ?, record_key = ?, name = ?, "
+                    "formatted_address = ?, formatted_phone_number = ?, website = ?, emails = ?, "
+                    "emails_website = ?, content_hash = ?, last_seen_at = ?, changed_at = ?, "
+                    "emails_refreshed_at = ? WHERE id = ?",
+                    (merged.get('place_id') or None,
+                     normalize_phone(merged.get('formatted_phone_number', '')) or row['phone'],
+                     website_domain(merged.get('website', '')) or row['domain'], record_key(merged),
+                     merged.get('name', ''), merged.get('formatted_address', ''),
+                     merged.get('formatted_phone_number', ''), merged.get('website', ''),
+                     json.dumps(merged.get('emails') or []),
+                     merged.get('website') if emails_refreshed else row['emails_website'], new_hash, now,
+                     now if status == 'changed' else row['changed_at'],
+                     now if emails_refreshed else row['emails_refreshed_at'], row['id']),
+                )
+            self._db.commit()
+            self._counts[status] += 1
+        return status
+
+    def changes_since(self, timestamp):
+        """Yields leads that were added or changed at or after a timestamp, as records."""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM leads WHERE changed_at >= ? ORDER BY id", (timestamp,)).fetchall()
+        for row in rows:
+            record = {field: row[field] or '' for field in LEAD_FIELDS}
+            record['emails'] = json.loads(row['emails'])
+            yield record
+
+    def run_started_at(self, run_id):
+        with self._lock:
+            row = self._db.execute("SELECT started_at FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return row['started_at'] if row else 0.0
+
+    def previous_run_count(self, query, location, run_id):
+        """Returns how many earlier runs were made for the same query and location."""
+        with self._lock:
+            row = self._db.execute("SELECT COUNT(*) FROM runs WHERE query = ? AND location = ? AND id < ?",
+                                   (query, location, run_id)).fetchone()
+        return row[0]
+
+    @property
+    def counts(self):
+        return dict(self._counts)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,251 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the request latency histogram buckets; slower requests fall in the last one
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_TOP_FUNCTIONS = 25 # Functions printed from a cProfile run, by cumulative time
+
+class Histogram:
+    """Counts of values per bucket, plus their count, sum and maximum."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, fraction):
+        """Returns the upper bound of the bucket holding the given fraction of values."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        labels = [f"<={bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {'count': self.count, 'mean': round(self.mean, 4), 'max': round(self.max, 4),
+                'buckets': dict(zip(labels, self.counts))}
+
+class StageTimer:
+    """Calls, wall time and CPU time of one instrumented stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'seconds': round(self.seconds, 4), 'cpu_seconds': round(self.cpu_seconds, 4)}
+
+class SourceMetrics:
+    """Requests, bytes and latency of one source (panorama, pkt, google, websites)."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = Histogram()
+
+    def as_dict(self):
+        return {'requests': self.requests, 'errors': self.errors, 'bytes': self.bytes,
+                'latency': self.latency.as_dict()}
+
+class RunMetrics:
+    """Everything measured during one run. Updated from many threads."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.stages = {}  # name -> StageTimer
+        self.sources = {} # name -> SourceMetrics
+        self.sleeps = {}  # kind -> seconds slept, summed over threads
+        self._lock = threading.Lock()
+
+    def _source(self, source):
+        metrics = self.sources.get(source)
+        if metrics is None:
+            metrics = self.sources[source] = SourceMetrics()
+        return metrics
+
+_metrics = RunMetrics()
+
+def run_metrics():
+    """Returns the metrics of the current run."""
+    return _metrics
+
+def reset_metrics():
+    """Starts the metrics over (e.g. between benchmark runs)."""
+    global _metrics
+    _metrics = RunMetrics()
+
+@contextmanager
+def stage(name):
+    """Adds the wall and CPU time of the block to a named stage.
+
+    CPU time is that of the calling thread. Stages may nest and may run on
+    many threads at once, so stage times add up to more than the run time.
+    """
+    started, cpu_started = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        seconds, cpu_seconds = time.perf_counter() - started, time.thread_time() - cpu_started
+        metrics = _metrics
+        with metrics._lock:
+            timer = metrics.stages.get(name)
+            if timer is None:
+                timer = metrics.stages[name] = StageTimer()
+            timer.calls += 1
+            timer.seconds += seconds
+            timer.cpu_seconds += cpu_seconds
+
+def record_request(source, latency, size=0, error=False):
+    """Records one HTTP request: seconds until the response headers arrived and body bytes."""
+    metrics = _metrics
+    with metrics._lock:
+        source_metrics = metrics._source(source)
+        source_metrics.requests += 1
+        source_metrics.errors += bool(error)
+        source_metrics.bytes += size
+        source_metrics.latency.observe(latency)
+
+def record_bytes(source, size):
+    """Adds body bytes read after the request was recorded (streamed responses)."""
+    metrics = _metrics
+    with metrics._lock:
+        metrics._source(source).bytes += size
+
+def record_sleep(kind, seconds):
+    """Records time spent waiting on purpose: rate limits, backoff, politeness delays."""
+    if seconds <= 0:
+        return
+    metrics = _metrics
+    with metrics._lock:
+        metrics.sleeps[kind] = metrics.sleeps.get(kind, 0.0) + seconds
+
+def timed_sleep(kind, seconds):
+    """time.sleep() that is counted in the run's sleep time."""
+    time.sleep(seconds)
+    record_sleep(kind, seconds)
+
+def metrics_report(**sections):
+    """Returns the run metrics as a JSON-serializable dict, with extra sections (e.g. cache=cache_stats())."""
+    metrics = _metrics
+    with metrics._lock:
+        report = {
+            'started_at': metrics.started_at,
+            'seconds': round(time.perf_counter() - metrics.started, 4),
+            'stages': {name: timer.as_dict() for name, timer in metrics.stages.items()},
+            'sources': {name: source.as_dict() for name, source in metrics.sources.items()},
+            'sleeps': {kind: round(seconds, 4) for kind, seconds in metrics.sleeps.items()},
+        }
+    report.update(sections)
+    return report
+
+def save_metrics(path, **sections):
+    """Writes the run metrics to a JSON file."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics_report(**sections), f, indent=2)
+    print(f"Run metrics saved to {path}")
+
+def print_run_profile():
+    """Prints time per stage, sleep time and request latency per source."""
+    report = metrics_report()
+    if not report['stages'] and not report['sources']:
+        return
+    print("\n=== Run profile ===")
+    print(f"Run time: {report['seconds']:.1f} s (stage and sleep times are summed over threads)")
+    if report['stages']:
+        print(f"{'stage':<22} {'calls':>7} {'seconds':>9} {'cpu s':>9}")
+        for name, timer in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            print(f"{name:<22} {timer['calls']:7d} {timer['seconds']:9.2f} {timer['cpu_seconds']:9.2f}")
+    if report['sleeps']:
+        print("Sleeping: " + ', '.join(f"{kind} {seconds:.1f} s" for kind, seconds in
+                                       sorted(report['sleeps'].items(), key=lambda item: -item[1])))
+    if _metrics.sources:
+        print(f"{'source':<10} {'requests':>8} {'errors':>6} {'KiB':>9} {'mean ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        for name, source in sorted(_metrics.sources.items()):
+            latency = source.latency
+            print(f"{name:<10} {source.requests:8d} {source.errors:6d} {source.bytes / 1024:9.1f} "
+                  f"{latency.mean * 1000:8.0f} {latency.quantile(0.95) * 1000:8.0f} {latency.max * 1000:8.0f}")
+
+@contextmanager
+def profile_run(path=None):
+    """Profiles the block and writes the result to path; does nothing without a path.
+
+    A .html or .txt path uses pyinstrument (pip install pyinstrument);
+    anything else is written as cProfile stats, which pstats, snakeviz and
+    other cProfile viewers open. The slowest functions are also printed.
+    """
+    if not path:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith(('.html', '.txt')):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError("HTML/text profiles need pyinstrument: pip install pyinstrument")
+        profiler = Profiler(async_mode='enabled')
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html() if path.endswith('.html') else profiler.output_text())
+            print(f"Profile saved to {path}")
+        return
+
+    import cProfile
+    import pstats
+    # cProfile only sees the thread that enabled it; sources and crawls run on
+    # worker threads, so every thread started during the run gets its own profiler
+    profilers = [cProfile.Profile()]
+    profilers_lock = threading.Lock()
+
+    def profile_thread(*args):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable() # Replaces this hook for the thread
+        except ValueError:
+            return # Python 3.12+: the first profiler already covers every thread
+        with profilers_lock:
+            profilers.append(profiler)
+
+    threading.setprofile(profile_thread)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        threading.setprofile(None)
+        for profiler in profilers:
+            profiler.disable()
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(path)
+        print(f"\n=== Profile (top {PROFILE_TOP_FUNCTIONS} by cumulative time, saved to {path}) ===")
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
@@ -0,0 +1,78 @@
+from importlib.util import find_spec
+
+# HTML parser used for directory listing pages and the tree-based email mode.
+# 'auto' picks the fastest installed backend: selectolax, then lxml, then html.parser.
+# Backends (and BeautifulSoup) are imported on the first parse, not at startup.
+PARSER_BACKEND = 'auto'
+
+_backends = None
+_SelectolaxParser = None
+
+# Single-pass scanning of raw HTML, no tree is built
+
+def available_backends():
+    """Returns the installed backends, fastest first."""
+    global _backends
+    if _backends is None:
+        backends = []
+        if find_spec('selectolax') is not None:
+            backends.append('selectolax')
+        if find_spec('lxml') is not None: # BeautifulSoup loads it
+            backends.append('lxml')
+        _backends = backends + ['html.parser']
+    return list(_backends)
+
+def _selectolax_parser():
+    """Imports the selectolax parser class on first use."""
+    global _SelectolaxParser
+    if _SelectolaxParser is None:
+        try:
+            from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+        except ImportError:
+            from selectolax.parser import HTMLParser as _SelectolaxParser # Older selectolax without the lexbor backend
+    return _SelectolaxParser
+
+def resolve_backend(backend=None):
+    """Returns the backend to use, falling back to html.parser if the requested one is missing."""
+    backend = backend or PARSER_BACKEND
+    available = available_backends()
+    if backend == 'auto':
+        return available[0]
+    if backend not in available:
+        print(f"Parser backend {backend} is not installed, using html.parser")
+        return 'html.parser'
+    return backend
+
+class SelectolaxNode:
+    """Wraps a selectolax node with the subset of the BeautifulSoup API the scrapers use."""
+    __slots__ = ('_node',)
+
+    def __init__(self, node):
+        self._node = node
+
+    def select(self, selector):
+        return [SelectolaxNode(node) for node in self._node.css(selector)]
+
+    def select_one(self, selector):
+        node = self._node.css_first(selector)
+        return SelectolaxNode(node) if node is not None else None
+
+    @property
+    def text(self):
+        return self._node.text(deep=True)
+
+    def get(self, attribute, default=None):
+        value = self._node.attributes.get(attribute)
+        return default if value is None else value
+
+def parse_html(markup, backend=None):
+    """Parses HTML with the configured backend.
+
+    The result supports select(), select_one(), .text and .get() the same way
+    for every backend.
+    """
+    backend = resolve_backend(backend)
+    if backend == 'selectolax':
+        return SelectolaxNode(_selectolax_parser()(markup).root)
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(markup, backend)
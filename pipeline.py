@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+from dedup import Deduplicator
+from enrichment import Enricher
+from metrics import stage
+
+# Records buffered between the sources and the pipeline. Sources block when it is full.
+QUEUE_SIZE = 200
+# Records being enriched at the same time; bounds memory for large runs
+MAX_IN_FLIGHT = 64
+
+_DONE = object() # Marks the end of one source
+
+def _run_source(name, source, loop, queue):
+    """Runs one blocking source on its own thread, feeding records into the queue."""
+    def emit(results):
+        for result in results:
+            # Blocks the source thread while the queue is full (backpressure)
+            asyncio.run_coroutine_threadsafe(queue.put(result), loop).result()
+
+    try:
+        with stage(f"source {name}"):
+            source(emit)
+    except Exception as e:
+        print(f"Error in source {name}: {e}")
+    finally:
+        asyncio.run_coroutine_threadsafe(queue.put(_DONE), loop).result()
+
+async def run_pipeline_async(sources, sink, fetch_emails=None, deduplicator=None, should_enrich=None,
+                             queue_size=QUEUE_SIZE, max_in_flight=MAX_IN_FLIGHT, enricher=None, crawl_failed=None):
+    """Streams records from sources through deduplication and enrichment into a sink.
+
+    A record without a website or phone number is held back until every
+    source is done, so a later duplicate from another source can still fill
+    them in (and get the website crawled); other records are written as soon
+    as they are complete.
+
+    sources: dict of name -> callable(emit); each calls emit(list_of_records) as pages arrive.
+    sink: callable(record), called once per unique record as soon as it is complete.
+    fetch_emails: blocking website -> emails function, or None to skip enrichment.
+    should_enrich: optional callable(record) -> bool deciding whether a record with
+        a website is crawled (e.g. to skip leads whose emails are still fresh).
+    crawl_failed: optional callable(record) called before a record whose website
+        could not be crawled is written (e.g. to keep the emails stored for it).
+    enricher: optional Enricher shared with other pipelines on the same loop; it
+        is used instead of fetch_emails and left open.
+    Returns the number of records written.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    deduplicator = deduplicator or Deduplicator()
+    owns_enricher = enricher is None
+    if owns_enricher:
+        enricher = Enricher(fetch_emails) if fetch_emails else None
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+    held = []        # Records missing a website or phone, written once every source is done
+    enriched = set() # id() of records whose website was crawled already
+    written = 0
+    remaining = len(sources)
+
+    def write(result):
+        nonlocal written
+        sink(result)
+        deduplicator.release(result) # Later duplicates can no longer be merged into it
+        enriched.discard(id(result))
+        written += 1
+
+    def finish(result):
+        if remaining and not (result.get('website') and result.get('formatted_phone_number')):
+            held.append(result)
+        else:
+            write(result)
+
+    async def enrich_and_write(result):
+        try:
+            if not await enricher.enrich(result) and crawl_failed:
+                crawl_failed(result)
+            finish(result)
+        finally:
+            in_flight.release()
+
+    async def dispatch(result):
+        if (enricher and result.get('website') and id(result) not in enriched
+                and (should_enrich is None or should_enrich(result))):
+            enriched.add(id(result))
+            await in_flight.acquire()
+            task = asyncio.create_task(enrich_and_write(result))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        else:
+            finish(result)
+
+    for name, source in sources.items():
+        threading.Thread(target=_run_source, args=(name, source, loop, queue), daemon=True).start()
+
+    try:
+        while remaining:
+            result = await queue.get()
+            if result is _DONE:
+                remaining -= 1
+                continue
+            with stage('dedup'):
+                unique = deduplicator.add(result)
+            if not unique:
+                continue
+            await dispatch(result)
+
+        # Every source is done: a held record may have got a website from a duplicate
+        for result in held:
+            await dispatch(result)
+        held.clear()
+        while tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        for result in held: # Interrupted: the held records still go to the sink, without a crawl
+            write(result)
+        for task in tasks:
+            task.cancel()
+        if enricher and owns_enricher:
+            enricher.close(wait=not tasks)
+
+    return written
+
+def run_pipeline(sources, sink, fetch_emails=None, **kwargs):
+    """Synchronous wrapper around run_pipeline_async for use from main()."""
+    return asyncio.run(run_pipeline_async(sources, sink, fetch_emails, **kwargs))
@@ -0,0 +1,162 @@
+import threading
+import time
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` calls per second with bursts up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until a call is allowed. Returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+class QuotaBudget:
+    """Thread-safe counter capping how many paid calls a run may make."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Reserves one call. Returns False once the budget is spent."""
+        with self._lock:
+            if self.limit is not None and self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def remaining(self):
+        return None if self.limit is None else max(self.limit - self.used, 0)
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Token bucket whose rate follows server feedback.
+
+    The rate grows after every healthy response (up to max_rate): by a
+    factor until the first throttling response, by a fixed step after it. It
+    is cut on throttling responses or when latency climbs well above the
+    lowest latency seen (down to min_rate). A Retry-After pauses all calls.
+    """
+
+    def __init__(self, rate, min_rate, max_rate, burst=1, increase=0.05, decrease=0.7,
+                 latency_factor=3.0, latency_decrease=0.8):
+        super().__init__(rate, burst)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = increase
+        self._step = increase * self.rate # Additive step after the first throttling, a fraction of the starting rate
+        self._slow_start = True
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_decrease = latency_decrease
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._latency = None # Moving average of response times
+        self._best_latency = None
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                pause = self._paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            time.sleep(pause)
+            waited += pause
+        return waited + super().acquire()
+
+    def on_success(self, latency=None):
+        """Records a healthy response and its latency in seconds."""
+        with self._lock:
+            if latency is not None:
+                self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+                if self._best_latency is None or self._latency < self._best_latency:
+                    self._best_latency = self._latency
+                if self._latency > self.latency_factor * max(self._best_latency, 0.05):
+                    # The server is slowing down: ease off before it starts refusing
+                    self.rate = max(self.min_rate, self.rate * self.latency_decrease)
+                    self._latency = self._best_latency * self.latency_factor / 2
+                    return
+            grown = self.rate * (1 + self.increase) if self._slow_start else self.rate + self._step
+            self.rate = min(self.max_rate, grown)
+
+    def on_throttle(self, retry_after=None):
+        """Records a throttling response (429/503); retry_after pauses all calls for that many seconds."""
+        with self._lock:
+            self.throttled += 1
+            self._slow_start = False
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+class CircuitBreaker:
+    """Stops calls to a host after repeated failures.
+
+    After failure_threshold failures in a row the circuit opens and allow()
+    returns False for reset_timeout seconds. Then one trial call is let
+    through: a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Returns True if a call may be made now."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._trial = False
@@ -1,21 +1,64 @@
 # --- START OF FILE scraper.py ---
 
+import argparse
+import re
 import requests
-import openpyxl
 import time
 import os
-import re
 import json
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, quote_plus
+from urllib.parse import quote_plus, urlsplit
 from dotenv import load_dotenv
 import random
+from concurrent.futures import ThreadPoolExecutor
+from http_client import (get_session, print_connection_stats, close_sessions, report_throttle, read_bounded,
+                         cache_response, connection_stats, send_deadline)
+from rate_limit import QuotaBudget
+from http_cache import cache_stats, print_cache_stats
+from pipeline import run_pipeline
+from exporters import FORMATS, PARTIAL_SUFFIX, JsonlSink, detect_format, export, read_jsonl, with_extension
+from parsers import parse_html
+from email_extractor import extract_emails, scan_html
+from lead_store import LeadStore
+from crawler import crawl_site, print_site_stats, site_stats
+from domain_cache import crawl_domain, domain_stats, print_domain_stats
+from metrics import print_run_profile, profile_run, record_sleep, save_metrics, stage, timed_sleep
+from batch import BATCH_WORKERS, load_jobs, run_batch
+from sharding import ClaimSet, city_grid, district_shards, parse_bounds, run_shards
 
 # Load API key from .env file
 load_dotenv()
 API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 
 OUTPUT_FILE = 'results.xlsx' # Changed from 'wyniki.xlsx'
+CHANGES_SUFFIX = '_changes'       # New and changed leads of a re-run
+
+# Google Places settings
+GOOGLE_MAX_PAGES = 3             # Limit number of pages to avoid API limits/costs
+GOOGLE_DETAILS_WORKERS = 8       # Details lookups running at the same time
+GOOGLE_DETAILS_QUOTA = 200       # Max billed requests (searches and details) per run
+GOOGLE_SHARDED_DETAILS_QUOTA = 1000 # The same for a sharded run (--shard), which finds many more places
+GOOGLE_MAX_RETRIES = 4           # Retries for OVER_QUERY_LIMIT responses
+GOOGLE_BACKOFF_BASE = 1.0        # Seconds, doubled on every retry
+GOOGLE_PAGE_TOKEN_DELAY = 2.0    # next_page_token needs a moment before it is valid
+PLACES_TEXTSEARCH_URL = 'https://maps.googleapis.com/maps/api/place/textsearch/json'
+PLACES_NEARBY_URL = 'https://maps.googleapis.com/maps/api/place/nearbysearch/json' # Grid cells (--shard)
+PLACE_DETAILS_URL = 'https://maps.googleapis.com/maps/api/place/details/json'
+
+# Directory (Panorama Firm, PKT.pl) settings.
+# Request rates per host adapt to server feedback, see THROTTLE_SETTINGS in http_client.py
+DIRECTORY_PREFETCH_DEPTH = 2     # Result pages requested ahead of the one being processed
+PANORAMA_URL = 'https://panoramafirm.pl'
+PKT_URL = 'https://www.pkt.pl'
+
+# 'single-pass' finds emails and links in one scan of the raw HTML (email_extractor.py),
+# 'tree' takes links from a tree built with the parser backend
+EMAIL_EXTRACTION_MODE = 'single-pass'
+
+# Business website fetches. Page size and per-site time limits are in crawler.py
+SITE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain') # Other types are not downloaded
+SITE_CONNECT_TIMEOUT = 5         # Seconds
+SITE_READ_TIMEOUT = 15           # Seconds without any data from the server
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([A-Za-z0-9_-]+)', re.IGNORECASE)
 
 # List of User-Agents for rotation to avoid blocking
 USER_AGENTS = [
@@ -29,170 +72,220 @@ def get_random_user_agent():
     """Returns a random User-Agent string."""
     return random.choice(USER_AGENTS)
 
-def scrape_panorama_firm(query, location, max_pages=3):
-    """Scrapes data from Panorama Firm website."""
+def _collect_pages(source_name, fetch_page, max_pages, limiter=None, prefetch_depth=DIRECTORY_PREFETCH_DEPTH,
+                   on_results=None, first_page=1, stats=None):
+    """Fetches max_pages result pages from first_page on, keeping up to prefetch_depth pages in flight.
+    
+    Pages are returned in order and collection stops at the first empty page.
+    Requests are paced by the adaptive per-host limiter of the session; an
+    optional limiter caps them further. Pages fetched ahead of an empty page
+    are discarded. If given, on_results is called with each page's records
+    as soon as the page is parsed, and stats['capped'] tells whether the last
+    page still had results (more may follow).
+    """
     results = []
+    last_page = first_page + max_pages - 1
+    if stats is not None:
+        stats['capped'] = False
     
-    try:
-        print(f"Scraping data from Panorama Firm for: {query} in {location}")
-        
-        # Build the search URL
-        search_query = f"{query} {location}"
-        encoded_query = quote_plus(search_query)
-        base_url = "https://panoramafirm.pl"
+    def throttled_fetch(page):
+        if limiter:
+            record_sleep('rate limit', limiter.acquire())
+        return fetch_page(page)
+    
+    with ThreadPoolExecutor(max_workers=max(1, prefetch_depth)) as executor:
+        futures = {}
+        next_page = first_page
+        for page in range(first_page, last_page + 1):
+            # Keep the pipeline of prefetched pages full
+            while next_page <= last_page and next_page < page + max(1, prefetch_depth):
+                futures[next_page] = executor.submit(throttled_fetch, next_page)
+                next_page += 1
+            
+            try:
+                page_results = futures.pop(page).result()
+            except Exception as e:
+                print(f"Error during {source_name} scraping: {e}")
+                break
+            
+            if not page_results:
+                print(f"No more results found on page {page}")
+                break
+            
+            results.extend(page_results)
+            if on_results:
+                on_results(page_results)
+            print(f"Found {len(page_results)} businesses on page {page} from {source_name}")
+            if stats is not None and page == last_page:
+                stats['capped'] = True
         
-        for page in range(1, max_pages + 1):
-            url = f"{base_url}/szukaj?k={encoded_query}&o={page}"
+        for future in futures.values(): # Pages past the last one are not needed
+            future.cancel()
+    
+    return results
+
+def _fetch_panorama_page(encoded_query, page):
+    """Fetches one Panorama Firm results page and returns the businesses on it."""
+    url = f"{PANORAMA_URL}/szukaj?k={encoded_query}&o={page}"
+    
+    headers = {
+        'User-Agent': get_random_user_agent(),
+        'Accept': 'text/html,application/xhtml+xml,application/xml',
+        'Accept-Language': 'en-US,en;q=0.9,pl;q=0.8', # Prioritize English
+        'Referer': f"{PANORAMA_URL}/",
+    }
+    
+    print(f"Fetching page {page} from Panorama Firm...")
+    response = get_session('panorama').get(url, headers=headers, timeout=15)
+    response.raise_for_status() # Raise an exception for HTTP errors
+    with stage('parse panorama'):
+        return _parse_panorama_page(response.text)
+
+def _parse_panorama_page(markup):
+    """Parses a Panorama Firm results page into records."""
+    soup = parse_html(markup)
+    businesses = soup.select('div.card.company-item')
+    
+    results = []
+    for business in businesses:
+        try:
+            # Basic data
+            name_elem = business.select_one('h2.company-name')
+            name = name_elem.text.strip() if name_elem else "Unknown Name"
             
-            headers = {
-                'User-Agent': get_random_user_agent(),
-                'Accept': 'text/html,application/xhtml+xml,application/xml',
-                'Accept-Language': 'en-US,en;q=0.9,pl;q=0.8', # Prioritize English
-                'Referer': 'https://panoramafirm.pl/',
-            }
+            # Address
+            address_elem = business.select_one('div.address')
+            address = address_elem.text.strip() if address_elem else ""
             
-            print(f"Fetching page {page} from Panorama Firm...")
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status() # Raise an exception for HTTP errors
+            # Phone
+            phone_elem = business.select_one('a[data-company-phone]')
+            phone = phone_elem.get('data-company-phone', "") if phone_elem else ""
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            businesses = soup.select('div.card.company-item')
+            # Website
+            website_elem = business.select_one('a.icon-website')
+            website = website_elem.get('href', "") if website_elem else ""
             
-            if not businesses:
-                print(f"No more results found on page {page}")
-                break
-                
-            for business in businesses:
-                try:
-                    # Basic data
-                    name_elem = business.select_one('h2.company-name')
-                    name = name_elem.text.strip() if name_elem else "Unknown Name"
-                    
-                    # Address
-                    address_elem = business.select_one('div.address')
-                    address = address_elem.text.strip() if address_elem else ""
-                    
-                    # Phone
-                    phone_elem = business.select_one('a[data-company-phone]')
-                    phone = phone_elem.get('data-company-phone', "") if phone_elem else ""
-                    
-                    # Website
-                    website_elem = business.select_one('a.icon-website')
-                    website = website_elem.get('href', "") if website_elem else ""
-                    
-                    # Check if it's not an internal Panorama Firm link
-                    if website and not website.startswith(('http://', 'https://')):
-                        website = ""
-                    
-                    result = {
-                        'name': name,
-                        'formatted_address': address,
-                        'formatted_phone_number': phone,
-                        'website': website,
-                        'emails': [] # Initialize emails list
-                    }
-                    
-                    results.append(result)
-                    
-                except Exception as e:
-                    print(f"Error processing a business entry: {e}")
+            # Check if it's not an internal Panorama Firm link
+            if website and not website.startswith(('http://', 'https://')):
+                website = ""
             
-            print(f"Found {len(businesses)} businesses on page {page}")
-            time.sleep(random.uniform(1.5, 3.0))  # Random delay between pages
+            result = {
+                'name': name,
+                'formatted_address': address,
+                'formatted_phone_number': phone,
+                'website': website,
+                'emails': [] # Initialize emails list
+            }
             
-        return results
+            results.append(result)
+            
+        except Exception as e:
+            print(f"Error processing a business entry: {e}")
     
-    except Exception as e:
-        print(f"Error during Panorama Firm scraping: {e}")
-        return results
+    return results
 
-def scrape_pkt_pl(query, location, max_pages=3):
-    """Scrapes data from PKT.pl website."""
-    results = []
+def scrape_panorama_firm(query, location, max_pages=3, prefetch_depth=DIRECTORY_PREFETCH_DEPTH, on_results=None,
+                         limiter=None, first_page=1, stats=None):
+    """Scrapes data from Panorama Firm website. An optional limiter caps the page rate further."""
+    print(f"Scraping data from Panorama Firm for: {query} in {location}")
     
-    try:
-        print(f"Scraping data from PKT.pl for: {query} in {location}")
-        
-        # Build the search URL
-        search_query = f"{query} {location}"
-        encoded_query = quote_plus(search_query)
-        base_url = "https://www.pkt.pl"
-        
-        for page in range(1, max_pages + 1):
-            url = f"{base_url}/szukaj/{encoded_query}/{page}"
+    # Build the search URL
+    encoded_query = quote_plus(f"{query} {location}")
+    return _collect_pages("Panorama Firm", lambda page: _fetch_panorama_page(encoded_query, page),
+                          max_pages, limiter, prefetch_depth, on_results, first_page, stats)
+
+def _fetch_pkt_page(encoded_query, page):
+    """Fetches one PKT.pl results page and returns the businesses on it."""
+    url = f"{PKT_URL}/szukaj/{encoded_query}/{page}"
+    
+    headers = {
+        'User-Agent': get_random_user_agent(),
+        'Accept': 'text/html,application/xhtml+xml,application/xml',
+        'Accept-Language': 'en-US,en;q=0.9,pl;q=0.8',
+        'Referer': f"{PKT_URL}/",
+    }
+    
+    print(f"Fetching page {page} from PKT.pl...")
+    response = get_session('pkt').get(url, headers=headers, timeout=15)
+    response.raise_for_status()
+    with stage('parse pkt'):
+        return _parse_pkt_page(response.text)
+
+def _parse_pkt_page(markup):
+    """Parses a PKT.pl results page into records."""
+    soup = parse_html(markup)
+    businesses = soup.select('li.list-items')
+    
+    results = []
+    for business in businesses:
+        try:
+            # Basic data
+            name_elem = business.select_one('h2.company-name a')
+            name = name_elem.text.strip() if name_elem else "Unknown Name"
             
-            headers = {
-                'User-Agent': get_random_user_agent(),
-                'Accept': 'text/html,application/xhtml+xml,application/xml',
-                'Accept-Language': 'en-US,en;q=0.9,pl;q=0.8',
-                'Referer': 'https://www.pkt.pl/',
-            }
+            # Address
+            address_elem = business.select_one('address.rest-address')
+            address = address_elem.text.strip() if address_elem else ""
             
-            print(f"Fetching page {page} from PKT.pl...")
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
+            # Phone
+            phone_elem = business.select_one('a.icon-telephone')
+            phone = phone_elem.text.strip() if phone_elem else ""
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            businesses = soup.select('li.list-items')
+            # Website
+            website_elem = business.select_one('a.company-url')
+            website = website_elem.get('href', "") if website_elem else ""
             
-            if not businesses:
-                print(f"No more results found on page {page}")
-                break
-                
-            for business in businesses:
-                try:
-                    # Basic data
-                    name_elem = business.select_one('h2.company-name a')
-                    name = name_elem.text.strip() if name_elem else "Unknown Name"
-                    
-                    # Address
-                    address_elem = business.select_one('address.rest-address')
-                    address = address_elem.text.strip() if address_elem else ""
-                    
-                    # Phone
-                    phone_elem = business.select_one('a.icon-telephone')
-                    phone = phone_elem.text.strip() if phone_elem else ""
-                    
-                    # Website
-                    website_elem = business.select_one('a.company-url')
-                    website = website_elem.get('href', "") if website_elem else ""
-                    
-                    # Check if it's not an internal PKT.pl link
-                    if website and base_url in website:
-                        website = ""
-                    
-                    result = {
-                        'name': name,
-                        'formatted_address': address,
-                        'formatted_phone_number': phone,
-                        'website': website,
-                        'emails': []
-                    }
-                    
-                    results.append(result)
-                    
-                except Exception as e:
-                    print(f"Error processing a business entry: {e}")
+            # Check if it's not an internal PKT.pl link (relative, or on the PKT_URL host)
+            if website and (not website.startswith(('http://', 'https://'))
+                            or urlsplit(website).hostname == urlsplit(PKT_URL).hostname):
+                website = ""
             
-            print(f"Found {len(businesses)} businesses on page {page}")
-            time.sleep(random.uniform(1.5, 3.0))  # Random delay between pages
+            result = {
+                'name': name,
+                'formatted_address': address,
+                'formatted_phone_number': phone,
+                'website': website,
+                'emails': []
+            }
             
-        return results
+            results.append(result)
+            
+        except Exception as e:
+            print(f"Error processing a business entry: {e}")
     
-    except Exception as e:
-        print(f"Error during PKT.pl scraping: {e}")
-        return results
+    return results
+
+def scrape_pkt_pl(query, location, max_pages=3, prefetch_depth=DIRECTORY_PREFETCH_DEPTH, on_results=None,
+                  limiter=None, first_page=1, stats=None):
+    """Scrapes data from PKT.pl website. An optional limiter caps the page rate further."""
+    print(f"Scraping data from PKT.pl for: {query} in {location}")
+    
+    # Build the search URL
+    encoded_query = quote_plus(f"{query} {location}")
+    return _collect_pages("PKT.pl", lambda page: _fetch_pkt_page(encoded_query, page),
+                          max_pages, limiter, prefetch_depth, on_results, first_page, stats)
 
-def search_places(query, location):
-    """Searches for places using Google Places API."""
+def search_places(query, location, area=None):
+    """Searches for places using Google Places API.
+    
+    With area (lat, lng, radius_in_meters), a Nearby Search for the query as
+    keyword is made instead: it only returns places inside the circle, where
+    a text search would treat the radius as a mere bias and return the same
+    city-wide results for every grid cell.
+    """
     if not API_KEY:
         print("Google Maps API key not found. Skipping Google Places search.")
         return [], None
     
     try:
-        url = 'https://maps.googleapis.com/maps/api/place/textsearch/json'
-        params = {'query': f'{query} in {location}', 'key': API_KEY}
-        resp = requests.get(url, params=params)
+        if area:
+            lat, lng, radius = area
+            url = PLACES_NEARBY_URL
+            params = {'keyword': query, 'location': f"{lat:.6f},{lng:.6f}", 'radius': int(radius), 'key': API_KEY}
+        else:
+            url = PLACES_TEXTSEARCH_URL
+            params = {'query': f'{query} in {location}', 'key': API_KEY}
+        resp = get_session('google').get(url, params=params) # Session applies the default timeout
         resp.raise_for_status()
         data = resp.json()
         
@@ -205,15 +298,15 @@ def search_places(query, location):
         print(f"Error during place search: {e}")
         return [], None
 
-def search_next_page(next_page_token):
-    """Fetches the next page of results from Google Places API."""
+def search_next_page(next_page_token, nearby=False):
+    """Fetches the next page of results from Google Places API (of a Nearby Search if nearby)."""
     if not API_KEY:
         return [], None
         
     try:
-        url = 'https://maps.googleapis.com/maps/api/place/textsearch/json'
         params = {'pagetoken': next_page_token, 'key': API_KEY}
-        resp = requests.get(url, params=params)
+        url = PLACES_NEARBY_URL if nearby else PLACES_TEXTSEARCH_URL
+        resp = get_session('google').get(url, params=params) # Session applies the default timeout
         resp.raise_for_status()
         data = resp.json()
         
@@ -226,33 +319,184 @@ def search_next_page(next_page_token):
         print(f"Error fetching next page: {e}")
         return [], None
 
-def get_place_details(place_id):
-    """Fetches place details from Google Places API."""
+def _request_place_details(place_id):
+    """Calls the Places details endpoint. Returns (status, result)."""
+    params = {
+        'place_id': place_id,
+        'fields': 'place_id,name,formatted_address,formatted_phone_number,website', # Requested fields
+        'key': API_KEY
+    }
+    resp = get_session('google').get(PLACE_DETAILS_URL, params=params) # Session applies the default timeout
+    resp.raise_for_status()
+    data = resp.json()
+    return data.get('status'), data.get('result', {})
+
+def get_place_details(place_id, limiter=None, budget=None):
+    """Fetches place details from Google Places API, retrying OVER_QUERY_LIMIT with backoff."""
     if not API_KEY:
         return {}
         
     try:
-        url = 'https://maps.googleapis.com/maps/api/place/details/json'
-        params = {
-            'place_id': place_id,
-            'fields': 'name,formatted_address,formatted_phone_number,website', # Requested fields
-            'key': API_KEY
-        }
-        resp = requests.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        if data.get('status') != 'OK':
-            print(f"Error fetching details for place {place_id}: {data.get('status')}")
-            return {}
+        for attempt in range(GOOGLE_MAX_RETRIES + 1):
+            if budget and not budget.take():
+                print(f"Google Places quota exhausted, skipping place {place_id}")
+                return {}
+            if limiter:
+                record_sleep('rate limit', limiter.acquire())
+                
+            status, result = _request_place_details(place_id)
             
-        return data.get('result', {})
+            if status == 'OVER_QUERY_LIMIT' and attempt < GOOGLE_MAX_RETRIES:
+                report_throttle('google', PLACE_DETAILS_URL) # Slows all details lookups down, not just this one
+                delay = GOOGLE_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, GOOGLE_BACKOFF_BASE)
+                print(f"Over query limit for place {place_id}, retrying in {delay:.1f} s")
+                timed_sleep('google backoff', delay)
+                continue
+                
+            if status != 'OK':
+                print(f"Error fetching details for place {place_id}: {status}")
+                return {}
+                
+            return result
+        return {}
     except requests.exceptions.RequestException as e:
         print(f"Error fetching details for place {place_id}: {e}")
         return {}
 
+def _emit_place_details(details, on_results):
+    """Passes one place's details to a streaming consumer."""
+    if details:
+        details.setdefault('emails', [])
+        on_results([details])
+
+def fetch_google_places(query, location, max_pages=GOOGLE_MAX_PAGES, on_results=None, limiter=None, budget=None,
+                        area=None, stats=None, seen_places=None):
+    """Runs a Places text search and fetches details for all results concurrently.
+    
+    Details for page N are fetched in the background while the next_page_token
+    delay for page N+1 is waited out. If given, on_results is called with each
+    place's details as soon as they arrive. Requests are paced by the adaptive
+    per-host limiter of the session; an optional limiter caps them further.
+    Search pages and details requests both count against the budget; a
+    shared budget makes several searches share one quota.
+    For sharded searches: area (lat, lng, radius) limits the search to a circle,
+    stats['capped'] tells whether more pages were left after max_pages, and
+    details of places claimed earlier in seen_places (a ClaimSet) are skipped.
+    """
+    budget = budget or QuotaBudget(GOOGLE_DETAILS_QUOTA)
+    futures = []
+    if stats is not None:
+        stats['capped'] = False
+    
+    with ThreadPoolExecutor(max_workers=GOOGLE_DETAILS_WORKERS) as executor:
+        next_page_token_val = None
+        token_received = 0.0
+        
+        for page_count in range(max_pages):
+            if not budget.take():
+                print("Google Places quota exhausted, no more searches")
+                break
+            if next_page_token_val:
+                print(f"Fetching page {page_count + 1} from Google Places...")
+                # API best practice: the token only becomes valid after a short delay
+                remaining = GOOGLE_PAGE_TOKEN_DELAY - (time.monotonic() - token_received)
+                if remaining > 0:
+                    timed_sleep('page token delay', remaining)
+                results, next_page_token_val = search_next_page(next_page_token_val, nearby=area is not None)
+            else:
+                results, next_page_token_val = search_places(query, location, area)
+            token_received = time.monotonic()
+                
+            if not results:
+                if page_count == 0: # Only print if no results on the first try
+                    print("No results found in Google Places.")
+                break # Exit loop if no results
+                
+            print(f"Found {len(results)} places on page {page_count + 1}, fetching details...")
+            for place in results:
+                place_id_val = place.get('place_id')
+                if seen_places is not None and place_id_val and not seen_places.claim(place_id_val):
+                    continue # Found by an overlapping shard already
+                if place_id_val:
+                    future = executor.submit(get_place_details, place_id_val, limiter, budget)
+                    if on_results:
+                        future.add_done_callback(lambda f: _emit_place_details(f.result(), on_results))
+                    futures.append(future)
+            
+            if not next_page_token_val: # If no more pages
+                break
+        else:
+            if stats is not None:
+                stats['capped'] = True # Results were left after the last page
+        
+        all_details = []
+        for future in futures: # Keep the order of the search results
+            details = future.result()
+            if details:
+                details.setdefault('emails', []) # Initialize emails for Google results
+                all_details.append(details)
+    
+    print(f"Fetched details for {len(all_details)} places ({budget.used} billed requests so far).")
+    return all_details
+
+def scan_page(markup, mode=None):
+    """Returns (emails, hrefs) found in one page of HTML."""
+    mode = mode or EMAIL_EXTRACTION_MODE
+    
+    with stage('scan website page'):
+        if mode == 'tree':
+            # Links from the parsed tree; emails (including scripts, attributes
+            # and obfuscated forms) still come from one scan of the raw HTML
+            soup = parse_html(markup)
+            hrefs = [link.get('href') for link in soup.select('a[href]')]
+            return extract_emails(markup), hrefs
+        
+        # Emails and links in a single pass over the raw HTML
+        return scan_html(markup)
+
+def decode_page(content, content_type=None):
+    """Decodes HTML bytes using the charset of the Content-Type header or a <meta> tag (UTF-8 by default)."""
+    charset = None
+    if content_type and 'charset=' in content_type.lower():
+        charset = content_type.lower().split('charset=')[-1].split(';')[0].strip(' "\'')
+    if not charset:
+        match = META_CHARSET.search(content, 0, 2048)
+        charset = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return content.decode(charset, errors='replace')
+    except LookupError: # Unknown charset name
+        return content.decode('utf-8', errors='replace')
+
+def _fetch_site_page(url, max_bytes, deadline):
+    """Fetches one page of a business website, reading at most max_bytes until the deadline.
+
+    Returns (final_url, markup, size_in_bytes, complete). The body is
+    streamed; non-HTML responses are closed unread and return markup None.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise requests.exceptions.Timeout(f"No time left for {url}")
+    headers = {
+        'User-Agent': get_random_user_agent(),
+        'Accept': 'text/html,application/xhtml+xml,application/xml',
+        'Accept-Language': 'en-US,en;q=0.9,pl;q=0.8',
+    }
+    timeout = (SITE_CONNECT_TIMEOUT, SITE_READ_TIMEOUT)
+    # Retries and their backoff end at the site deadline too, not just the first attempt
+    with send_deadline(deadline), \
+            get_session('websites').get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and content_type.split(';')[0].strip().lower() not in SITE_CONTENT_TYPES:
+            print(f"Skipping {url}: {content_type}")
+            return response.url, None, 0, True
+        content, complete = read_bounded(response, max_bytes, deadline)
+        if complete:
+            cache_response('websites', response)
+        return response.url, decode_page(content, content_type), len(content), complete
+
 def extract_emails_from_website(url):
-    """Extracts email addresses from a website."""
+    """Extracts email addresses from a website. Returns None if the site could not be crawled."""
     if not url:
         return []
     
@@ -261,253 +505,256 @@ def extract_emails_from_website(url):
         # Add protocol if missing
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
-            
-        headers = {
-            'User-Agent': get_random_user_agent(),
-            'Accept': 'text/html,application/xhtml+xml,application/xml',
-            'Accept-Language': 'en-US,en;q=0.9,pl;q=0.8',
-        }
-        
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        # Use regex to find email addresses
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b' # Updated TLD length
-        emails = re.findall(email_pattern, response.text)
         
-        # Also, get emails from contact pages if available
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # Homepage first, then the likeliest contact pages ("kontakt", "contact", ...)
+        # until emails are found or the per-site page/byte/time budget runs out
+        # Placeholder and service addresses are dropped by the extractor (BLOCKED_DOMAINS)
+        # Each domain is crawled once per TTL across records and runs (domain_cache.py)
+        with stage('crawl website'):
+            emails, crawl = crawl_domain(url, lambda url, contact_url: crawl_site(
+                url, _fetch_site_page, scan_page, contact_url=contact_url))
         
-        # Check subpages like "kontakt" or "contact"
-        contact_links = []
-        base_domain = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(url))
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if any(keyword in href.lower() for keyword in ['kontakt', 'contact', 'about', 'o-nas']): # Added Polish 'o-nas'
-                # Add full URL if it's relative
-                if href.startswith('/'):
-                    contact_links.append(base_domain + href)
-                elif href.startswith('http'):
-                    contact_links.append(href)
-                else: # Handle cases like 'contact.html'
-                    contact_links.append(base_domain + '/' + href)
-        
-        # Remove duplicate contact links
-        contact_links = list(set(contact_links))
-        
-        # Visit found contact pages (limit to 2 to avoid excessive requests)
-        for contact_url in contact_links[:2]:
-            try:
-                contact_response = requests.get(contact_url, headers={'User-Agent': get_random_user_agent()}, timeout=10)
-                contact_response.raise_for_status()
-                contact_emails = re.findall(email_pattern, contact_response.text)
-                emails.extend(contact_emails)
-            except Exception as e:
-                print(f"Could not fetch contact page {contact_url}: {e}")
-        
-        # Check JavaScript and other page elements that might contain hidden emails
-        # Emails are often obfuscated from bots
-        for script_tag in soup.find_all(['script', 'noscript']): # Changed 'script' to 'script_tag'
-            if script_tag.string:
-                script_emails = re.findall(email_pattern, script_tag.string)
-                emails.extend(script_emails)
-        
-        # Check 'data-email' attribute often used for hidden emails
-        for element in soup.find_all(attrs={"data-email": True}):
-            data_email = element.get('data-email')
-            if data_email and '@' in data_email: # Ensure data_email is not None
-                emails.append(data_email)
-        
-        # Remove duplicates and filter emails
-        unique_emails = list(set(emails))
-        
-        # Filter out common generic or spammy domains
-        filtered_emails = [email for email in unique_emails if not any(
-            domain in email.lower() for domain in ['example.com', 'domain.com', 'yourmail.com', 'wixpress.com', 'sentry.io'] # Added more common spam/service domains
-        )]
-        
-        print(f"Found {len(filtered_emails)} unique email addresses.")
-        return filtered_emails
+        if crawl:
+            print(f"Found {len(crawl.emails)} unique email addresses on {crawl.pages} pages "
+                  f"({crawl.bytes // 1024} KiB, {crawl.seconds:.1f} s).")
+        return emails
     
     except Exception as e:
         print(f"Error fetching emails from {url}: {e}")
-        return []
-
-def merge_results(google_results, panorama_results, pkt_results):
-    """Merges results from different sources and removes duplicates."""
-    all_results = []
-    all_results.extend(google_results)
-    all_results.extend(panorama_results)
-    all_results.extend(pkt_results)
-    
-    # Remove duplicates based on name and address
-    unique_results = []
-    unique_keys = set()
-    
-    for result in all_results:
-        name = result.get('name', '').strip().lower() # Add strip() for consistency
-        address_parts = result.get('formatted_address', '').lower().split(',')
-        # Use first part of address (street) and name for a more robust key
-        simple_address = address_parts[0].strip() if address_parts else ""
-        key = f"{name}|{simple_address}" # Simplified key for better deduplication
-        
-        if key not in unique_keys and name and simple_address: # Ensure name and address part are present
-            unique_keys.add(key)
-            unique_results.append(result)
-        elif name and not simple_address and f"{name}|" not in unique_keys: # Handle cases with name but no address
-             unique_keys.add(f"{name}|")
-             unique_results.append(result)
-
-    return unique_results
+        return None
 
-def save_to_excel(data, filename=OUTPUT_FILE):
-    """Saves data to an Excel file."""
+def save_results(data, filename=OUTPUT_FILE, fmt=None, confirm_overwrite=True):
+    """Saves data to an Excel, CSV, JSONL or Parquet file (by fmt or the file extension).
+    
+    Returns the file name written (the user may pick another one). Errors
+    are raised, so callers can keep the records they were saving from.
+    """
+    fmt = detect_format(filename, fmt)
     # Check if file exists
-    if os.path.exists(filename):
+    if confirm_overwrite and os.path.exists(filename):
         confirm = input(f"File {filename} already exists. Overwrite? (y/n): ").lower()
         if confirm != 'y':
             new_name = input("Enter a new filename: ")
             if new_name:
-                filename = new_name if new_name.endswith('.xlsx') else f"{new_name}.xlsx"
+                filename = new_name if new_name.endswith('.' + fmt) else f"{new_name}.{fmt}"
     
-    try:
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        
-        # Headers with three separate columns for email addresses
-        ws.append(['Name', 'Address', 'Phone', 'Website', 'Email 1', 'Email 2', 'Email 3', 'Other Emails'])
-        
-        for item in data:
-            # Get the list of emails
-            emails = item.get('emails', [])
-            
-            # Prepare list of values to add to the row
-            row_data = [
-                item.get('name', ''),
-                item.get('formatted_address', ''),
-                item.get('formatted_phone_number', ''),
-                item.get('website', '')
-            ]
-            
-            # Add the first three emails in separate columns
-            for i in range(3):
-                if i < len(emails):
-                    row_data.append(emails[i])
-                else:
-                    row_data.append('')  # Empty column if no email
-            
-            # Add remaining emails in the last column, comma-separated
-            if len(emails) > 3:
-                row_data.append(', '.join(emails[3:]))
-            else:
-                row_data.append('')
-                
-            ws.append(row_data)
-            
-        # Adjust column widths
-        for column_cells in ws.columns: # Changed 'column' to 'column_cells' for clarity
-            max_length = 0
-            column_letter = openpyxl.utils.get_column_letter(column_cells[0].column)
-            for cell in column_cells:
-                try:
-                    if cell.value is not None and len(str(cell.value)) > max_length: # Check for None
-                        max_length = len(str(cell.value))
-                except: # Broad except, consider specific exceptions if known
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column_letter].width = min(adjusted_width, 60)  # Limit max width slightly more
-        
-        wb.save(filename)
-        print(f'✅ Saved {len(data)} records to {filename}')
-    except Exception as e:
-        print(f"Error saving to Excel: {e}")
+    with stage(f"export {fmt}"):
+        count = export(data, filename, fmt)
+    print(f'✅ Saved {count} records to {filename}')
+    return filename
 
-def main():
-    query = input("Enter the industry (e.g., hairdresser): ").strip()
-    location = input("Enter the city (e.g., Krakow): ").strip()
+def parse_args(argv=None):
+    """Parses command line options. Without --query the script asks for everything interactively."""
+    parser = argparse.ArgumentParser(description="Collect business leads from Panorama Firm, PKT.pl and Google Places.")
+    parser.add_argument('-q', '--query', help="Industry to search for, e.g. hairdresser")
+    parser.add_argument('-l', '--location', help="City to search in, e.g. Krakow")
+    parser.add_argument('--emails', action='store_true', help="Extract emails from business websites")
+    parser.add_argument('--google', action='store_true', help="Also use the Google Places API")
+    parser.add_argument('-o', '--output', help=f"Output file (default: {OUTPUT_FILE} with the format's extension)")
+    parser.add_argument('-f', '--format', choices=FORMATS, help="Output format (default: from the output file extension, else xlsx)")
+    parser.add_argument('-y', '--yes', action='store_true', help="Overwrite existing output files without asking")
+    parser.add_argument('--batch', metavar='JOBS_FILE',
+                        help="Run every job of a JSON Lines file without prompts (--emails/--google/--format are the defaults)")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Jobs running at the same time in batch mode")
+    parser.add_argument('--shard', action='store_true',
+                        help="Search the city district by district and on a lat/lng grid to get past result caps")
+    parser.add_argument('--bbox', type=parse_bounds, metavar='S,W,N,E',
+                        help="Bounds of the Places grid for a city not in sharding.CITY_BOUNDS")
+    parser.add_argument('--metrics', metavar='JSON_FILE', help="Save timings, request counts and latencies of the run as JSON")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="Profile the whole run: cProfile stats, or a pyinstrument report for .html/.txt files")
+    return parser.parse_args(argv)
+
+def make_sources(query, location, use_google=False, limiters=None, shard=False, bounds=None):
+    """Returns the sources dict for run_pipeline. Shared limiters throttle several jobs together.
+    
+    With shard, the location is searched in parts (see make_sharded_sources).
+    """
+    if shard:
+        return make_sharded_sources(query, location, use_google, limiters, bounds)
+    limiters = limiters or {}
+    sources = {
+        'Panorama Firm': lambda emit: scrape_panorama_firm(query, location, on_results=emit,
+                                                           limiter=limiters.get('panorama')),
+        'PKT.pl': lambda emit: scrape_pkt_pl(query, location, on_results=emit, limiter=limiters.get('pkt')),
+    }
+    if use_google and API_KEY:
+        sources['Google Places'] = lambda emit: fetch_google_places(
+            query, location, on_results=emit, limiter=limiters.get('google'), budget=limiters.get('google_budget'))
+    return sources
+
+def make_sharded_sources(query, location, use_google=False, limiters=None, bounds=None):
+    """Returns sources that search a city in parts to get past the per-search result caps.
+    
+    The directories are searched district by district (sharding.CITY_DISTRICTS),
+    and capped districts continue with further pages. Places are searched on
+    a lat/lng grid over the city (CITY_BOUNDS or bounds) with Nearby Search,
+    and capped cells are split into quarters. Shards run in parallel under the shared per-host
+    limiters; overlapping results are merged by the pipeline's deduplication.
+    """
+    limiters = limiters or {}
+    
+    def directory_source(name, scrape, limiter):
+        def source(emit):
+            def search(shard):
+                stats = {}
+                scrape(query, shard.location, max_pages=shard.max_pages, on_results=emit, limiter=limiter,
+                       first_page=shard.first_page, stats=stats)
+                return stats['capped']
+            run_shards(name, district_shards(location), search)
+        return source
+    
+    sources = {
+        'Panorama Firm': directory_source('Panorama Firm', scrape_panorama_firm, limiters.get('panorama')),
+        'PKT.pl': directory_source('PKT.pl', scrape_pkt_pl, limiters.get('pkt')),
+    }
+    if not (use_google and API_KEY):
+        return sources
     
-    scrape_emails_choice = input("Do you want to extract emails from websites? (y/n): ").lower() == 'y'
-    use_google_choice = input("Do you want to use Google Places API? (y/n): ").lower() == 'y'
+    cells = city_grid(location, bounds)
+    budget = limiters.get('google_budget') or QuotaBudget(GOOGLE_SHARDED_DETAILS_QUOTA)
+    if not cells:
+        print(f"No grid known for {location}, Google Places is searched without sharding (see --bbox)")
+        sources['Google Places'] = lambda emit: fetch_google_places(
+            query, location, on_results=emit, limiter=limiters.get('google'), budget=budget)
+        return sources
     
-    all_google_details = []
-    all_panorama_results = []
-    all_pkt_results = []
+    seen_places = ClaimSet() # Cells overlap: fetch the (billed) details of each place once
     
-    # Fetch data from Panorama Firm (always)
-    print("\n=== Fetching data from Panorama Firm ===")
-    all_panorama_results = scrape_panorama_firm(query, location)
+    def google_source(emit):
+        def search(cell):
+            stats = {}
+            lat, lng = cell.center
+            fetch_google_places(query, location, on_results=emit, limiter=limiters.get('google'), budget=budget,
+                                area=(lat, lng, cell.radius), stats=stats, seen_places=seen_places)
+            return stats['capped']
+        run_shards('Google Places', cells, search)
     
-    # Fetch data from PKT.pl (always)
-    print("\n=== Fetching data from PKT.pl ===")
-    all_pkt_results = scrape_pkt_pl(query, location)
+    sources['Google Places'] = google_source
+    return sources
+
+def main_batch(args):
+    """Runs all jobs of a job file in one process, without prompts."""
+    fmt = args.format or 'xlsx'
+    jobs = load_jobs(args.batch, defaults={'emails': args.emails, 'google': args.google, 'shard': args.shard,
+                                           'format': fmt})
+    if not jobs:
+        print(f"No jobs found in {args.batch}")
+        return
+    print(f"Running {len(jobs)} jobs with {args.workers} workers")
+    
+    # One Google quota for the whole batch, not per job. Request rates are
+    # already shared: the adaptive limiters in http_client are per host.
+    limiters = {'google_budget': QuotaBudget(GOOGLE_DETAILS_QUOTA)}
+    
+    def save(partial_file, output, job_format):
+        save_results(read_jsonl(partial_file), output, job_format, confirm_overwrite=False)
     
-    # Fetch data from Google Places (optional)
-    if use_google_choice and API_KEY:
-        print("\n=== Fetching data from Google Places API ===")
-        next_page_token_val = None # Renamed 'token' to avoid conflict with token module
-        page_count = 0
-        max_google_pages = 3  # Limit number of pages to avoid API limits/costs
+    store = LeadStore()
+    try:
+        run_batch(jobs, lambda query, location, use_google, shard: make_sources(query, location, use_google,
+                                                                                limiters, shard),
+                  save, extract_emails_from_website if any(job.get('emails') for job in jobs) else None,
+                  store=store, workers=args.workers, fmt=fmt)
+    finally:
+        store.close()
+        print_connection_stats()
+        print_cache_stats()
+        print_domain_stats()
+        print_site_stats()
+        print_run_profile()
+        close_sessions()
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        with profile_run(args.profile):
+            if args.batch:
+                main_batch(args)
+            else:
+                main_single(args)
+    finally:
+        if args.metrics:
+            save_metrics(args.metrics, connections=connection_stats(), cache=cache_stats(),
+                         websites=site_stats().as_dict(), domains=domain_stats())
+
+def main_single(args):
+    """Runs one query, asking for anything not given on the command line."""
+    if args.query:
+        query, location = args.query, args.location or ''
+        scrape_emails_choice, use_google_choice = args.emails, args.google
+    else:
+        query = input("Enter the industry (e.g., hairdresser): ").strip()
+        location = input("Enter the city (e.g., Krakow): ").strip()
         
-        try:
-            while page_count < max_google_pages:
-                if next_page_token_val:
-                    print(f"Fetching page {page_count + 1} from Google Places...")
-                    time.sleep(2) # API best practice: wait before requesting next page
-                    results, next_page_token_val = search_next_page(next_page_token_val)
-                else:
-                    results, next_page_token_val = search_places(query, location)
-                    
-                if not results:
-                    if page_count == 0: # Only print if no results on the first try
-                        print("No results found in Google Places.")
-                    break # Exit loop if no results
-                    
-                print(f"Found {len(results)} places on page {page_count + 1}")
-                
-                for i, place in enumerate(results):
-                    place_id_val = place.get('place_id') # Renamed 'pid'
-                    if place_id_val:
-                        print(f"Fetching details {i+1}/{len(results)}: {place.get('name', 'Unknown Name')}")
-                        details = get_place_details(place_id_val)
-                        
-                        if details:
-                            details['emails'] = [] # Initialize emails for Google results
-                            all_google_details.append(details)
-                            
-                        time.sleep(random.uniform(0.2, 0.5)) # Shorter delay for details
-                
-                page_count += 1
-                if not next_page_token_val: # If no more pages
-                    break
-        except Exception as e:
-            print(f"Error fetching data from Google Places: {e}")
+        scrape_emails_choice = input("Do you want to extract emails from websites? (y/n): ").lower() == 'y'
+        use_google_choice = input("Do you want to use Google Places API? (y/n): ").lower() == 'y'
+    
+    output_format = detect_format(args.output or OUTPUT_FILE, args.format)
+    output_file = args.output or with_extension(OUTPUT_FILE, output_format)
     
-    # Merge all results
-    all_results = merge_results(all_google_details, all_panorama_results, all_pkt_results)
-    print(f"\nAfter deduplication, we have {len(all_results)} unique businesses.")
+    # Sources, deduplication, email enrichment and the output file run as one stream:
+    # records are written to a partial file as soon as they are complete
+    sources = make_sources(query, location, use_google_choice, shard=args.shard, bounds=args.bbox)
     
-    # If user wants emails, fetch them for each business with a website URL
+    partial_file = os.path.splitext(output_file)[0] + PARTIAL_SUFFIX
+    print(f"\n=== Fetching data from {', '.join(sources)} ===")
     if scrape_emails_choice:
-        print("\n=== Fetching emails from websites ===")
-        total_with_website = sum(1 for result in all_results if result.get('website'))
-        print(f"Found {total_with_website} businesses with website addresses.")
-        
-        processed_websites = 0
-        for result in all_results: # No need for index 'i' if not used
-            website = result.get('website')
-            if website:
-                processed_websites += 1
-                print(f"[{processed_websites}/{total_with_website}] Fetching emails for: {result.get('name', 'Unknown Name')}")
-                emails = extract_emails_from_website(website)
-                result['emails'] = emails
-                # Delay to avoid overloading servers
-                time.sleep(random.uniform(1.0, 2.0))
-    
-    # Save all data to Excel file
-    if all_results:
-        save_to_excel(all_results)
+        print("Emails are fetched from websites as businesses arrive.")
+    
+    # Every lead is also kept in the lead store, so later runs only crawl new or stale websites
+    store = LeadStore()
+    run_id = store.start_run(query, location)
+    
+    try:
+        with JsonlSink(partial_file, flush_each=True) as sink:
+            def write(result):
+                store.save(result)
+                sink.write(result)
+            
+            with stage('pipeline'):
+                total = run_pipeline(sources, write, extract_emails_from_website if scrape_emails_choice else None,
+                                     should_enrich=store.should_enrich, crawl_failed=store.crawl_failed)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Records collected so far are kept in {partial_file}")
+        store.finish_run(run_id)
+        close_sessions()
+        raise
+    
+    store.finish_run(run_id)
+    counts = store.counts
+    print(f"\nAfter deduplication, we have {total} unique businesses "
+          f"({counts['new']} new, {counts['changed']} changed since earlier runs).")
+    
+    # Save all data to the output file
+    if total:
+        # The partial file holds the only copy of the records until the output file is written
+        try:
+            save_results(read_jsonl(partial_file), output_file, output_format, confirm_overwrite=not args.yes)
+        except Exception as e:
+            print(f"Error saving to {output_format}: {e}")
+            print(f"The {total} records are kept in {partial_file}")
+        else:
+            os.remove(partial_file)
     else:
         print("No data to save.")
+    
+    # On re-runs, also save just the leads that are new or changed since the last run
+    if store.previous_run_count(query, location, run_id) and (counts['new'] or counts['changed']):
+        changes_file = os.path.splitext(output_file)[0] + CHANGES_SUFFIX + '.' + output_format
+        try:
+            save_results(store.changes_since(store.run_started_at(run_id)), changes_file, output_format,
+                         confirm_overwrite=not args.yes)
+        except Exception as e:
+            print(f"Error saving the changes to {changes_file}: {e}")
+    store.close()
+    
+    print_connection_stats()
+    print_cache_stats()
+    print_domain_stats()
+    print_site_stats()
+    print_run_profile()
+    close_sessions()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -10,7 +10,14 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Installed by requirements.txt but never imported by the scraper. openpyxl, bs4
+    # and the parser backends are imported inside functions and still found.
+    excludes=[
+        'pandas', 'numpy', 'selenium', 'undetected_chromedriver', 'webdriver_manager', 'trio',
+        'trio_websocket', 'wsproto', 'websockets', 'websocket', 'PySimpleGUI', 'tkinter', '_tkinter',
+        'discogs_client', 'musicbrainzngs', 'oauthlib', 'tqdm', 'validators', 'sortedcontainers',
+        'dateutil', 'pytz', 'setuptools', 'pkg_resources', 'unittest', 'pydoc', 'benchmarks',
+    ],
     noarchive=False,
     optimize=0,
 )
@@ -26,7 +33,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False, # Compressed libraries are unpacked again on every launch
     upx_exclude=[],
     runtime_tmpdir=None,
     console=True,
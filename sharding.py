@@ -0,0 +1,165 @@
+import math
+import threading
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Splitting one city-wide search into many smaller ones. Every source returns
+# a capped number of results per search (3 directory pages, 60 places), so a
+# big city is searched district by district (directories) or cell by cell
+# (Places), and a shard that still hits the cap is subdivided.
+SHARD_WORKERS = 4              # Shards of one source searched at the same time
+GRID_SIZE = 3                  # The Places grid starts with GRID_SIZE x GRID_SIZE cells over the city
+MAX_SPLIT_DEPTH = 2            # A capped cell is split into four, at most this many times
+MIN_CELL_RADIUS = 400          # Meters; cells this small are not split any further
+DIRECTORY_PAGE_WINDOW = 3      # Pages read per directory shard; a capped district continues with the next pages
+MAX_DIRECTORY_PAGES = 12       # Pages read per district at most
+
+# Districts searched in the directories ("fryzjer" in "Warszawa Mokotów")
+CITY_DISTRICTS = {
+    'warszawa': ['Bemowo', 'Białołęka', 'Bielany', 'Mokotów', 'Ochota', 'Praga-Południe', 'Praga-Północ',
+                 'Rembertów', 'Śródmieście', 'Targówek', 'Ursus', 'Ursynów', 'Wawer', 'Wesoła', 'Wilanów',
+                 'Włochy', 'Wola', 'Żoliborz'],
+    'krakow': ['Stare Miasto', 'Grzegórzki', 'Prądnik Czerwony', 'Prądnik Biały', 'Krowodrza', 'Bronowice',
+               'Zwierzyniec', 'Dębniki', 'Łagiewniki-Borek Fałęcki', 'Swoszowice', 'Podgórze Duchackie',
+               'Bieżanów-Prokocim', 'Podgórze', 'Czyżyny', 'Mistrzejowice', 'Bieńczyce', 'Wzgórza Krzesławickie',
+               'Nowa Huta'],
+    'lodz': ['Bałuty', 'Górna', 'Polesie', 'Śródmieście', 'Widzew'],
+    'wroclaw': ['Fabryczna', 'Krzyki', 'Psie Pole', 'Stare Miasto', 'Śródmieście'],
+    'poznan': ['Grunwald', 'Jeżyce', 'Nowe Miasto', 'Stare Miasto', 'Wilda'],
+    'gdansk': ['Śródmieście', 'Wrzeszcz', 'Oliwa', 'Przymorze', 'Zaspa', 'Chełm', 'Orunia', 'Letnica', 'Osowa'],
+}
+# (south, west, north, east) of the cities covered by the Places grid
+CITY_BOUNDS = {
+    'warszawa': (52.097, 20.851, 52.368, 21.271),
+    'krakow': (49.967, 19.792, 50.126, 20.217),
+    'lodz': (51.686, 19.320, 51.860, 19.640),
+    'wroclaw': (51.042, 16.807, 51.211, 17.176),
+    'poznan': (52.291, 16.731, 52.509, 17.072),
+    'gdansk': (54.274, 18.429, 54.447, 18.950),
+}
+CITY_ALIASES = {'warsaw': 'warszawa', 'cracow': 'krakow', 'breslau': 'wroclaw', 'posen': 'poznan', 'danzig': 'gdansk'}
+
+def city_key(location):
+    """Returns the key of a city in the tables above ("Kraków" -> "krakow")."""
+    text = (location or '').strip().lower().replace('ł', 'l')
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return CITY_ALIASES.get(text, text)
+
+class DirectoryShard:
+    """A directory search for one district, reading pages first_page onwards."""
+
+    def __init__(self, location, first_page=1, max_pages=DIRECTORY_PAGE_WINDOW):
+        self.location = location
+        self.first_page = first_page
+        self.max_pages = max_pages
+
+    def subdivide(self):
+        """A text search has no smaller area than a district, so a capped one continues with the next pages."""
+        first_page = self.first_page + self.max_pages
+        if first_page > MAX_DIRECTORY_PAGES:
+            return []
+        return [DirectoryShard(self.location, first_page, min(self.max_pages, MAX_DIRECTORY_PAGES - first_page + 1))]
+
+    def __str__(self):
+        return f"{self.location} (pages {self.first_page}-{self.first_page + self.max_pages - 1})"
+
+class GridCell:
+    """A lat/lng rectangle searched as a circle around its center."""
+
+    def __init__(self, south, west, north, east, depth=0):
+        self.south, self.west, self.north, self.east = south, west, north, east
+        self.depth = depth
+
+    @property
+    def center(self):
+        return (self.south + self.north) / 2, (self.west + self.east) / 2
+
+    @property
+    def radius(self):
+        """Meters from the center to a corner, so the circle covers the whole cell."""
+        lat, _ = self.center
+        height = (self.north - self.south) * 111320
+        width = (self.east - self.west) * 111320 * math.cos(math.radians(lat))
+        return math.hypot(height, width) / 2
+
+    def subdivide(self):
+        """Splits the cell into four quarters, unless it is already small or deep enough."""
+        if self.depth >= MAX_SPLIT_DEPTH or self.radius / 2 < MIN_CELL_RADIUS:
+            return []
+        lat, lng = self.center
+        return [GridCell(south, west, north, east, self.depth + 1)
+                for south, north in ((self.south, lat), (lat, self.north))
+                for west, east in ((self.west, lng), (lng, self.east))]
+
+    def __str__(self):
+        lat, lng = self.center
+        return f"{lat:.4f},{lng:.4f} r={self.radius:.0f} m"
+
+def district_shards(location):
+    """Returns one directory shard per district of a known city, else one for the whole location."""
+    districts = CITY_DISTRICTS.get(city_key(location))
+    if not districts:
+        return [DirectoryShard(location)]
+    return [DirectoryShard(f"{location} {district}") for district in districts]
+
+def city_grid(location, bounds=None, size=GRID_SIZE):
+    """Returns the initial Places grid over a city (bounds: (south, west, north, east)), or [] if unknown."""
+    bounds = bounds or CITY_BOUNDS.get(city_key(location))
+    if not bounds:
+        return []
+    south, west, north, east = bounds
+    lat_step, lng_step = (north - south) / size, (east - west) / size
+    return [GridCell(south + row * lat_step, west + col * lng_step, south + (row + 1) * lat_step,
+                     west + (col + 1) * lng_step)
+            for row in range(size) for col in range(size)]
+
+def parse_bounds(text):
+    """Parses "south,west,north,east" into a tuple of floats."""
+    south, west, north, east = (float(part) for part in text.split(','))
+    if south >= north or west >= east:
+        raise ValueError("expected south,west,north,east with south < north and west < east")
+    return south, west, north, east
+
+class ClaimSet:
+    """Thread-safe set of keys; claim() returns True only for the first caller of a key."""
+
+    def __init__(self):
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            return True
+
+def run_shards(name, shards, search, workers=SHARD_WORKERS):
+    """Searches shards in parallel, subdividing every shard that hits its result cap.
+
+    search(shard) emits its results itself and returns True when the shard
+    was capped. Returns (shards searched, shards capped).
+    """
+    searched = capped = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {executor.submit(search, shard): shard for shard in shards}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                shard = pending.pop(future)
+                searched += 1
+                try:
+                    hit_cap = future.result()
+                except Exception as e:
+                    print(f"Error searching {name} shard {shard}: {e}")
+                    continue
+                if not hit_cap:
+                    continue
+                capped += 1
+                children = shard.subdivide()
+                if children:
+                    print(f"{name} shard {shard} hit the result cap, splitting into {len(children)}")
+                for child in children:
+                    pending[executor.submit(search, child)] = child
+    print(f"{name}: searched {searched} shards, {capped} hit the result cap")
+    return searched, capped